@@ -0,0 +1,164 @@
+'''headless batch scoring of claims files, it does not import streamlit
+
+claims of inpatient and outpatient csv files are read and prepared in chunks of --chunk-size (beneficiary data is
+kept in memory), each chunk is scored and its predictions are appended to output csv, so claim rows, features and
+predictions of only one chunk are in memory.
+Claims of the files are first folded into the reference stats (first pass over the files), so every claim is
+featurized against the whole file as it would be if whole file was scored as one batch, and predictions do not
+depend on chunk size. The folded stats are in memory: they keep the ClaimID of every claim of the files and a row
+for every distinct key combination (provider x beneficiary, provider x physician, tf-idf terms ...), so memory grows
+with the files.
+--out-of-core runs preparing and feature engineering as SQL (sql_features.py, needs duckdb) which spills to
+--temp-directory beyond --memory-limit, with claims of train files (not the reference stats file) as reference,
+and features are predicted in chunks as they are read, so memory is bounded by --memory-limit and --chunk-size
+however large claim files are.
+Time taken by each stage is written to a json file along with output, with per stage calls, time, rows (and
+peak memory with --trace-memory) of finer stages (feature blocks, tf-idf columns, model) under "stages",
+--prometheus writes these stages in prometheus text format too.
+Run "python reference_stats.py fit" once before, otherwise stats of whole train data are aggregated on every run.
+
+usage: python -m batch_score beneficiary.csv inpatient.csv outpatient.csv -o predictions.csv [--chunk-size 20000] [--workers 8]
+                             [--trace-memory] [--prometheus stages.prom]
+                             [--out-of-core [--memory-limit 2GB] [--temp-directory spill]]'''
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from data_prep import TRAIN_FILES, get_train_data, iter_prepared_chunks
+from feature_spec import FEATURE_COLUMNS
+from profiling import Profiler, profile, stage
+from reference_stats import REFERENCE_STATS_PATH, fit_reference_stats, load_reference_stats_if_fitted
+from scoring import predict_features, predict_fraud, scoring_plan
+
+
+OUTPUT_COLS = ['ClaimID', 'Provider', 'BeneID']
+
+
+def score_files(ben_file, inp_file, out_file, output, chunk_size=20000, stats_path=REFERENCE_STATS_PATH, workers=None):
+    '''scores all claims of given files and writes predictions to output csv, returns dict of timings and counts'''
+    timings = {'read_csv': 0.0, 'preparing_data': 0.0, 'load_reference': 0.0, 'fold_claims': 0.0, 'feature_engg': 0.0,
+               'prediction': 0.0, 'write_output': 0.0}
+    start = time.perf_counter()
+    reference_stats = load_reference_stats_if_fitted(stats_path)
+    reference = 'reference_stats'
+    if reference_stats is None:
+        reference_stats = fit_reference_stats(get_train_data())
+        reference = 'train_data'
+    timings['load_reference'] = time.perf_counter()-start
+
+    for chunk in iter_prepared_chunks((ben_file, inp_file, out_file), chunk_size, timings):
+        start = time.perf_counter()
+        with stage('fold_claims', len(chunk)):
+            reference_stats.update(chunk)
+        timings['fold_claims'] += time.perf_counter()-start
+
+    n_chunks = 0
+    n_claims = 0
+    n_fraud = 0
+    for chunk in iter_prepared_chunks((ben_file, inp_file, out_file), chunk_size, timings):
+        y_pred, fraud_proba, chunk_timings = predict_fraud(chunk, reference_stats, workers=workers)
+        for name, seconds in chunk_timings.items():
+            timings[name] += seconds
+
+        start = time.perf_counter()
+        with stage('write_output', len(chunk)):
+            result = chunk[OUTPUT_COLS].assign(FraudProbability=fraud_proba, PredictedFraud=y_pred)
+            result.to_csv(output, mode='w' if n_chunks == 0 else 'a', header=n_chunks == 0, index=False)
+        timings['write_output'] += time.perf_counter()-start
+        n_chunks += 1
+        n_claims += len(chunk)
+        n_fraud += int(y_pred.sum())
+
+    return {'timings': timings, 'claims': n_claims, 'chunks': n_chunks, 'predicted_fraud': n_fraud,
+            'reference': reference}
+
+def score_files_out_of_core(ben_file, inp_file, out_file, output, chunk_size=20000, memory_limit='2GB',
+                            temp_directory=None, train_files=TRAIN_FILES):
+    '''scores all claims of given files as score_files, with preparing and features computed out of core by
+    sql_features.SqlFeatureBackend against claims of train_files, returns dict of timings and counts'''
+    from sql_features import SqlFeatureBackend
+
+    timings = {'sql_prepare': 0.0, 'sql_features': 0.0, 'prediction': 0.0, 'write_output': 0.0}
+    n_chunks = 0
+    n_claims = 0
+    n_fraud = 0
+    #prepared claims and features are parquet files in a temp directory, removed after scoring
+    with tempfile.TemporaryDirectory(dir=temp_directory) as directory:
+        backend = SqlFeatureBackend(memory_limit, os.path.join(directory, 'spill'))
+        paths = dict((name, os.path.join(directory, name+'.parquet')) for name in ('train', 'claims', 'features'))
+        start = time.perf_counter()
+        backend.prepare(train_files, paths['train'])
+        backend.prepare((ben_file, inp_file, out_file), paths['claims'])
+        timings['sql_prepare'] = time.perf_counter()-start
+
+        start = time.perf_counter()
+        backend.features(paths['claims'], paths['train'], paths['features'], scoring_plan())
+        timings['sql_features'] = time.perf_counter()-start
+
+        #features are in the sequence of claims file, so ids of claims are put side by side with them
+        result = backend.con.execute('SELECT c.ClaimID, c.Provider, c.BeneID, f.* EXCLUDE (ClaimID) '
+                                     "FROM read_parquet('"+paths['claims'].replace("'", "''")+"') c "
+                                     "POSITIONAL JOIN read_parquet('"+paths['features'].replace("'", "''")+"') f")
+        #duckdb returns chunks of 2048 rows (a vector)
+        vectors = max(1, chunk_size//2048)
+        while True:
+            chunk = result.fetch_df_chunk(vectors)
+            if not len(chunk):
+                break
+            start = time.perf_counter()
+            y_pred, fraud_proba = predict_features(chunk[FEATURE_COLUMNS])
+            timings['prediction'] += time.perf_counter()-start
+
+            start = time.perf_counter()
+            with stage('write_output', len(chunk)):
+                chunk = chunk[OUTPUT_COLS].assign(FraudProbability=fraud_proba, PredictedFraud=y_pred)
+                chunk.to_csv(output, mode='w' if n_chunks == 0 else 'a', header=n_chunks == 0, index=False)
+            timings['write_output'] += time.perf_counter()-start
+            n_chunks += 1
+            n_claims += len(chunk)
+            n_fraud += int(y_pred.sum())
+
+    return {'timings': timings, 'claims': n_claims, 'chunks': n_chunks, 'predicted_fraud': n_fraud,
+            'reference': 'train_files'}
+
+def main():
+    parser = argparse.ArgumentParser(description='score claims of beneficiary, inpatient and outpatient csv files')
+    parser.add_argument('beneficiary')
+    parser.add_argument('inpatient')
+    parser.add_argument('outpatient')
+    parser.add_argument('-o', '--output', default='predictions.csv')
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    parser.add_argument('--stats', default=REFERENCE_STATS_PATH, help='precomputed reference stats file')
+    parser.add_argument('--timings', help='json file for timings, default is <output>_timings.json')
+    parser.add_argument('--workers', type=int, help='no of threads computing feature blocks, default is FEATURE_WORKERS env variable or 1')
+    parser.add_argument('--trace-memory', action='store_true', help='trace peak memory of every stage (slows down scoring)')
+    parser.add_argument('--prometheus', help='file for stages in prometheus text format')
+    parser.add_argument('--out-of-core', action='store_true', help='prepare and featurize as SQL spilling to disk (needs duckdb)')
+    parser.add_argument('--memory-limit', default='2GB', help='memory of SQL engine with --out-of-core')
+    parser.add_argument('--temp-directory', help='directory of temp files with --out-of-core, default is system temp')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with profile(Profiler(args.trace_memory)) as profiler:
+        if args.out_of_core:
+            report = score_files_out_of_core(args.beneficiary, args.inpatient, args.outpatient, args.output,
+                                             args.chunk_size, args.memory_limit, args.temp_directory)
+        else:
+            report = score_files(args.beneficiary, args.inpatient, args.outpatient, args.output, args.chunk_size,
+                                 args.stats, args.workers)
+    report['timings']['total'] = time.perf_counter()-start
+    report['stages'] = profiler.report()
+    if args.prometheus:
+        with open(args.prometheus, 'w') as f:
+            f.write(profiler.to_prometheus())
+    timings_path = args.timings or os.path.splitext(args.output)[0]+'_timings.json'
+    with open(timings_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('scored', report['claims'], 'claims in', round(report['timings']['total'], 2), 'sec, predictions written to',
+          args.output, 'and timings to', timings_path)
+
+
+if __name__ == '__main__':
+    main()
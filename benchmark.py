@@ -0,0 +1,345 @@
+'''reproducible benchmark of data preparation, featurization and prediction on synthetic claims
+
+Synthetic beneficiary, inpatient and outpatient csv files have the schema of archive/ csv files and roughly their
+cardinalities (ids per claim, size of code vocabularies, null rates and skew of claims per id, see ID_POOLS,
+CODE_POOLS and NULL_RATES), so any no of claims (10k to 10M) can be generated. Files are generated once per
+(claims, seed) into --data-dir, in chunks, so generating 10M claims does not need memory for all of them.
+
+Every size is benchmarked in a fresh process (so the memory high-water mark is of that size only):
+  - files are read and prepared (read_csv, preparing_data stages) and reference stats are fitted on
+    synthetic train files of --reference-claims claims
+  - prepared claims are scored by predict_fraud in batches of every --batch-sizes (up to --max-batches batches
+    each, 'full' is all claims as one batch), recording latency of batches, claims per sec and time of every stage
+    (stages of profiling.py, with peak memory of every stage if --trace-memory)
+Results are written to --output json and compared with --baseline json (if it exists), any throughput, stage time or
+memory worse than baseline by more than --tolerance is reported as regression and exit code is 1.
+--save-baseline writes the results as the new baseline. Timings depend on the machine, so baseline should be
+saved on the machine it is compared on.
+
+usage: python -m benchmark [--sizes 10k,100k,1m,10m] [--batch-sizes 1,100,10000,full] [--baseline benchmark_baseline.json]
+                           [--save-baseline] [--trace-memory]'''
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from data_prep import preparing_data, read_raw_data
+from profiling import Profiler, profile
+from reference_stats import fit_reference_stats
+from scoring import predict_fraud
+
+
+BENCHMARK_DATA_DIR = 'bench_data'
+BASELINE_PATH = 'benchmark_baseline.json'
+SIZES = '10k,100k'
+BATCH_SIZES = '1,100,10000,full'
+GENERATE_CHUNK = 1000000
+CLAIM_ID_SPAN = 10**9
+
+#columns of the archive csv files, in their sequence
+BEN_COLS = (['BeneID', 'DOB', 'DOD', 'Gender', 'Race', 'RenalDiseaseIndicator', 'State', 'County', 'NoOfMonths_PartACov',
+             'NoOfMonths_PartBCov'] +
+            ['ChronicCond_'+name for name in ['Alzheimer', 'Heartfailure', 'KidneyDisease', 'Cancer', 'ObstrPulmonary',
+                                             'Depression', 'Diabetes', 'IschemicHeart', 'Osteoporasis',
+                                             'rheumatoidarthritis', 'stroke']] +
+            ['IPAnnualReimbursementAmt', 'IPAnnualDeductibleAmt', 'OPAnnualReimbursementAmt', 'OPAnnualDeductibleAmt'])
+DX_COLS = ['ClmDiagnosisCode_'+str(i) for i in range(1, 11)]
+PROC_COLS = ['ClmProcedureCode_'+str(i) for i in range(1, 7)]
+INP_COLS = (['BeneID', 'ClaimID', 'ClaimStartDt', 'ClaimEndDt', 'Provider', 'InscClaimAmtReimbursed', 'AttendingPhysician',
+             'OperatingPhysician', 'OtherPhysician', 'AdmissionDt', 'ClmAdmitDiagnosisCode', 'DeductibleAmtPaid',
+             'DischargeDt', 'DiagnosisGroupCode'] + DX_COLS + PROC_COLS)
+OUT_COLS = (['BeneID', 'ClaimID', 'ClaimStartDt', 'ClaimEndDt', 'Provider', 'InscClaimAmtReimbursed', 'AttendingPhysician',
+             'OperatingPhysician', 'OtherPhysician'] + DX_COLS + PROC_COLS + ['DeductibleAmtPaid', 'ClmAdmitDiagnosisCode'])
+
+#shape of train archive data (558k claims), share of inpatient claims and for id columns: prefix, first id,
+#no of distinct ids per claim and skew of claims per id (zipf exponent, 0 is uniform)
+INPATIENT_SHARE = 0.0725
+ID_POOLS = {'BeneID': ('BENE', 11001, 0.248, 0.3),
+            'Provider': ('PRV', 51001, 0.0097, 0.9),
+            'AttendingPhysician': ('PHY', 330001, 0.147, 0.8),
+            'OperatingPhysician': ('PHY', 330001, 0.063, 0.8),
+            'OtherPhysician': ('PHY', 330001, 0.083, 0.8)}
+#code vocabularies do not grow with claims: no of distinct codes and skew
+CODE_POOLS = {'dx': (10450, 1.0), 'admit_dx': (4098, 1.0), 'drg': (736, 0.7), 'proc': (1100, 1.0)}
+#share of null values in inpatient and outpatient claims
+NULL_RATES = dict([('AttendingPhysician', (0.003, 0.003)), ('OperatingPhysician', (0.41, 0.83)),
+                   ('OtherPhysician', (0.89, 0.63)), ('ClmAdmitDiagnosisCode', (0.0, 0.80)),
+                   ('DeductibleAmtPaid', (0.02, 0.001))] +
+                  list(zip(DX_COLS, zip([0.0, 0.006, 0.018, 0.042, 0.075, 0.125, 0.182, 0.247, 0.339, 0.907],
+                                        [0.02, 0.35, 0.56, 0.70, 0.80, 0.85, 0.88, 0.90, 0.92, 0.998]))) +
+                  list(zip(PROC_COLS, zip([0.431, 0.869, 0.977, 0.997, 0.9998, 1.0],
+                                          [0.9997, 0.99998, 1.0, 1.0, 1.0, 1.0]))))
+
+
+def parse_size(text):
+    '''"10k" -> 10000, "1m" -> 1000000, "full" -> None'''
+    text = text.strip().lower()
+    if text == 'full':
+        return None
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip('km'))*scale)
+
+def _cdf(size, skew):
+    weights = 1/np.arange(1, size+1)**skew
+    return np.cumsum(weights)/weights.sum()
+
+def _draw(rng, cdf, n):
+    #ranks (0 is most frequent) drawn with zipf like weights
+    return np.minimum(np.searchsorted(cdf, rng.random(n), side='right'), len(cdf)-1)
+
+def _code_vocabulary(seed):
+    '''string codes of every code pool, same for all sizes of a seed'''
+    rng = np.random.default_rng(seed)
+    dx = np.array(['%03d%s' % (rng.integers(1, 1000), str(rng.integers(0, 100)).zfill(2)[:rng.integers(1, 3)])
+                   for _ in range(CODE_POOLS['dx'][0])], dtype=object)
+    #some of dx codes are V and E codes, as in icd 9
+    special = rng.random(len(dx)) < 0.08
+    dx[special] = [('V' if rng.random() < 0.7 else 'E')+code[1:] for code in dx[special]]
+    dx = pd.unique(dx)
+    return {'dx': dx, 'admit_dx': dx[rng.permutation(len(dx))[:CODE_POOLS['admit_dx'][0]]],
+            'drg': np.array(['%03d' % code for code in rng.permutation(999)[:CODE_POOLS['drg'][0]]+1], dtype=object),
+            'proc': (rng.permutation(9000)[:CODE_POOLS['proc'][0]]+1000).astype(float)}
+
+def _codes(rng, codes, pool, n):
+    #vocabulary can be a bit smaller than size in CODE_POOLS, as duplicate codes are dropped
+    return codes[pool][_draw(rng, _cdf(len(codes[pool]), CODE_POOLS[pool][1]), n)]
+
+def _ids(col, ranks):
+    prefix, first = ID_POOLS[col][:2]
+    return (prefix+pd.Series(ranks+first).astype(str)).values
+
+def _pool_size(col, n_claims):
+    return max(1, int(round(ID_POOLS[col][2]*n_claims)))
+
+def _dates(rng, n, max_days):
+    start = pd.Timestamp('2008-11-27')+pd.to_timedelta(rng.integers(0, 400, n), unit='D')
+    end = start+pd.to_timedelta(rng.integers(0, max_days+1, n), unit='D')
+    return start.strftime('%Y-%m-%d').values, end.strftime('%Y-%m-%d').values
+
+def _claims_chunk(rng, n, first_id, n_claims, inpatient, codes):
+    '''n synthetic inpatient or outpatient claims, ids are drawn from pools sized for n_claims claims'''
+    null_col = 0 if inpatient else 1
+    data = {}
+    for col, (prefix, first, per_claim, skew) in ID_POOLS.items():
+        #cdf of a pool is built per chunk, it is small compared to the chunk
+        data[col] = _ids(col, _draw(rng, _cdf(_pool_size(col, n_claims), skew), n))
+    data['ClaimID'] = ('CLM'+('I' if inpatient else 'O')+pd.Series(np.arange(first_id, first_id+n)).astype(str)).values
+    start, end = _dates(rng, n, 35 if inpatient else 1)
+    data['ClaimStartDt'], data['ClaimEndDt'] = start, end
+    if inpatient:
+        data['AdmissionDt'], data['DischargeDt'] = start, end
+        data['InscClaimAmtReimbursed'] = rng.integers(1, 58, n)*1000
+        data['DeductibleAmtPaid'] = np.full(n, 1068.0)
+        data['DiagnosisGroupCode'] = _codes(rng, codes, 'drg', n)
+    else:
+        data['InscClaimAmtReimbursed'] = np.minimum(rng.geometric(0.004, n)*10, 102500)
+        data['DeductibleAmtPaid'] = np.where(rng.random(n) < 0.97, 0, rng.integers(1, 900, n)).astype(float)
+    data['ClmAdmitDiagnosisCode'] = _codes(rng, codes, 'admit_dx', n)
+    for col in DX_COLS:
+        data[col] = _codes(rng, codes, 'dx', n)
+    for col in PROC_COLS:
+        data[col] = _codes(rng, codes, 'proc', n)
+    chunk = pd.DataFrame(data, columns=INP_COLS if inpatient else OUT_COLS)
+    for col, rates in NULL_RATES.items():
+        chunk.loc[rng.random(n) < rates[null_col], col] = None
+    return chunk
+
+def _beneficiaries(rng, n):
+    ids = _ids('BeneID', np.arange(n))
+    dob = pd.Timestamp('1909-01-01')+pd.to_timedelta(rng.integers(0, 365*75, n), unit='D')
+    dod = pd.Series(pd.Timestamp('2009-01-01')+pd.to_timedelta(rng.integers(0, 11, n)*30, unit='D')).dt.strftime('%Y-%m-%d')
+    data = {'BeneID': ids, 'DOB': dob.strftime('%Y-%m-%d').values, 'DOD': dod.where(rng.random(n) < 0.01).values,
+            'Gender': rng.integers(1, 3, n), 'Race': rng.choice([1, 2, 3, 5], n, p=[0.85, 0.1, 0.02, 0.03]),
+            'RenalDiseaseIndicator': np.where(rng.random(n) < 0.15, 'Y', '0'), 'State': rng.integers(1, 55, n),
+            'County': rng.integers(0, 1000, n), 'NoOfMonths_PartACov': np.where(rng.random(n) < 0.99, 12, rng.integers(0, 12, n)),
+            'NoOfMonths_PartBCov': np.where(rng.random(n) < 0.99, 12, rng.integers(0, 12, n))}
+    for col in BEN_COLS:
+        if col.startswith('ChronicCond_'):
+            data[col] = rng.integers(1, 3, n)
+    data['IPAnnualReimbursementAmt'] = np.where(rng.random(n) < 0.75, 0, rng.integers(1, 60, n)*1000)
+    data['IPAnnualDeductibleAmt'] = np.where(data['IPAnnualReimbursementAmt'] > 0, 1068, 0)
+    data['OPAnnualReimbursementAmt'] = rng.integers(0, 300, n)*10
+    data['OPAnnualDeductibleAmt'] = rng.integers(0, 100, n)*10
+    return pd.DataFrame(data, columns=BEN_COLS)
+
+def generate_files(n_claims, seed=0, data_dir=BENCHMARK_DATA_DIR):
+    '''writes synthetic beneficiary, inpatient and outpatient csv files of n_claims claims (if not written yet),
+    returns their paths in the sequence of TRAIN_FILES'''
+    directory = os.path.join(data_dir, '%d_%d' % (n_claims, seed))
+    files = tuple(os.path.join(directory, name+'.csv') for name in ('beneficiary', 'inpatient', 'outpatient'))
+    #meta is written at last, a directory without meta has incomplete files
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        return files
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng([seed, n_claims])
+    codes = _code_vocabulary(seed)
+    #claim ids of files of different seeds (test and reference files) do not overlap, as in archive train and test files
+    claim_offset = seed*CLAIM_ID_SPAN
+    _beneficiaries(rng, _pool_size('BeneID', n_claims)).to_csv(files[0], index=False)
+    n_inpatient = int(round(n_claims*INPATIENT_SHARE))
+    for path, inpatient, total in ((files[1], True, n_inpatient), (files[2], False, n_claims-n_inpatient)):
+        #a file of no claims still gets its header
+        for first_id in range(0, max(total, 1), GENERATE_CHUNK):
+            chunk = _claims_chunk(rng, min(GENERATE_CHUNK, total-first_id), claim_offset+first_id, n_claims, inpatient, codes)
+            chunk.to_csv(path, mode='w' if first_id == 0 else 'a', header=first_id == 0, index=False)
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump({'claims': n_claims, 'seed': seed, 'inpatient': n_inpatient}, f)
+    return files
+
+def max_rss_bytes():
+    '''memory high-water mark of this process, None where resource module is not available'''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #ru_maxrss is in bytes on macos and in kilobytes on linux
+    return rss if sys.platform == 'darwin' else rss*1024
+
+def _batch_result(latencies, n_claims, profiler):
+    seconds = float(np.sum(latencies))
+    return {'batches': len(latencies), 'claims': n_claims, 'seconds': seconds,
+            'claims_per_sec': n_claims/seconds if seconds else None,
+            'p50_ms': float(np.percentile(latencies, 50)*1000), 'p99_ms': float(np.percentile(latencies, 99)*1000),
+            'stages': profiler.report()}
+
+def run_case(n_claims, batch_sizes, reference_claims, seed, data_dir, max_batches, trace_memory):
+    '''benchmarks one size, it is run in a fresh process, returns dict of results'''
+    files = generate_files(n_claims, seed, data_dir)
+    reference_files = generate_files(reference_claims, seed+1, data_dir)
+    result = {'claims': n_claims}
+    with profile(Profiler(trace_memory)) as profiler:
+        reference_stats = fit_reference_stats(preparing_data(*read_raw_data(reference_files)))
+    result['reference_stages'] = profiler.report()
+    with profile(Profiler(trace_memory)) as profiler:
+        prepared = preparing_data(*read_raw_data(files))
+    result['load_stages'] = profiler.report()
+    result['prepared_claims'] = len(prepared)
+
+    #models are loaded by a first prediction, so their loading is not counted in latency of batches
+    start = time.perf_counter()
+    predict_fraud(prepared.iloc[:1], reference_stats)
+    result['warmup_seconds'] = time.perf_counter()-start
+
+    result['batch_sizes'] = {}
+    for batch_size in batch_sizes:
+        size = len(prepared) if batch_size is None or batch_size >= len(prepared) else batch_size
+        name = 'full' if size == len(prepared) else str(size)
+        if name in result['batch_sizes']:
+            continue
+        latencies = []
+        scored = 0
+        with profile(Profiler(trace_memory)) as profiler:
+            for i in range(min(math.ceil(len(prepared)/size), max_batches)):
+                batch = prepared.iloc[i*size:(i+1)*size]
+                start = time.perf_counter()
+                predict_fraud(batch, reference_stats)
+                latencies.append(time.perf_counter()-start)
+                scored += len(batch)
+        result['batch_sizes'][name] = _batch_result(latencies, scored, profiler)
+    result['max_rss_bytes'] = max_rss_bytes()
+    return result
+
+def run_benchmark(sizes, batch_sizes, reference_claims=100000, seed=0, data_dir=BENCHMARK_DATA_DIR, max_batches=50,
+                  trace_memory=False):
+    '''runs run_case of every size in a fresh process, returns results with details of environment'''
+    context = multiprocessing.get_context('spawn')
+    cases = {}
+    for n_claims in sizes:
+        with context.Pool(1) as pool:
+            cases[str(n_claims)] = pool.apply(run_case, (n_claims, batch_sizes, reference_claims, seed, data_dir,
+                                                         max_batches, trace_memory))
+    return {'meta': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                     'platform': platform.platform(), 'cpus': os.cpu_count(), 'seed': seed,
+                     'reference_claims': reference_claims, 'max_batches': max_batches,
+                     'time': time.strftime('%Y-%m-%d %H:%M:%S')},
+            'cases': cases}
+
+def _metrics(case):
+    '''(name, value, higher is better) of a case compared with baseline'''
+    metrics = [('load '+entry['stage']+' sec', entry['seconds'], False) for entry in case['load_stages']]
+    for name, batch in case['batch_sizes'].items():
+        metrics.append(('batch '+name+' claims/sec', batch['claims_per_sec'], True))
+        metrics.append(('batch '+name+' p99 ms', batch['p99_ms'], False))
+    metrics.append(('max rss bytes', case['max_rss_bytes'], False))
+    return metrics
+
+def compare(results, baseline, tolerance=0.2):
+    '''returns rows (claims, metric, baseline value, value, change, regression) of metrics present in both'''
+    rows = []
+    for size, case in results['cases'].items():
+        if size not in baseline['cases']:
+            continue
+        base_metrics = dict((name, value) for name, value, _ in _metrics(baseline['cases'][size]))
+        for name, value, higher_better in _metrics(case):
+            base = base_metrics.get(name)
+            if not base or value is None:
+                continue
+            change = value/base-1
+            regression = change < -tolerance if higher_better else change > tolerance
+            rows.append((int(size), name, base, value, change, regression))
+    return rows
+
+def print_results(results):
+    for size, case in results['cases'].items():
+        print('%s claims (max rss %.0f MB)' % (size, (case['max_rss_bytes'] or 0)/2**20))
+        for entry in case['load_stages']:
+            print('  %-40s %10.3f sec' % (entry['stage'], entry['seconds']))
+        for name, batch in case['batch_sizes'].items():
+            print('  batch %-34s %10.0f claims/sec  p50 %9.2f ms  p99 %9.2f ms' % (
+                name, batch['claims_per_sec'] or 0, batch['p50_ms'], batch['p99_ms']))
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark featurization and prediction on synthetic claims')
+    parser.add_argument('--sizes', default=SIZES, help='no of claims of synthetic files, comma separated (k and m suffixes)')
+    parser.add_argument('--batch-sizes', default=BATCH_SIZES, help='claims per predict_fraud call, "full" is all claims')
+    parser.add_argument('--reference-claims', default='100k', help='no of claims of synthetic train files for reference stats')
+    parser.add_argument('--max-batches', type=int, default=50, help='max batches scored for every batch size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=BENCHMARK_DATA_DIR)
+    parser.add_argument('--trace-memory', action='store_true', help='trace peak memory of every stage (slows down stages)')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='write results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed change from baseline, 0.2 is 20%%')
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    batch_sizes = [parse_size(size) for size in args.batch_sizes.split(',')]
+    results = run_benchmark(sizes, batch_sizes, parse_size(args.reference_claims), args.seed, args.data_dir,
+                            args.max_batches, args.trace_memory)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_results(results)
+    print('results written to', args.output)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.tolerance)
+        print('compared with', args.baseline, 'of', baseline['meta']['time'])
+        for claims, name, base, value, change, regression in rows:
+            print('  %10d %-36s %14.4g -> %14.4g %+7.1f%% %s' % (claims, name, base, value, change*100,
+                                                               'REGRESSION' if regression else ''))
+        regressions = [row for row in rows if row[-1]]
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('baseline written to', args.baseline)
+    if regressions:
+        print(len(regressions), 'regressions')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+'''bounded in process caches for data and shared resources, they do not depend on streamlit
+
+Unlike @st.cache, returned values are not hashed on every call: entries are found by a small key (fingerprint of
+input files, see prepared_cache.files_fingerprint, or modification time and size of a file) and the cached object
+itself is returned (no copy), so callers must not modify returned data.
+    @cached('test_data', max_entries=2, ttl=3600, key=lambda: files_fingerprint(TEST_FILES))
+    def get_data(): ...
+    @resource('reference_stats', key=lambda: file_stat_key(REFERENCE_STATS_PATH))
+    def get_reference_stats(): ...
+A cache keeps up to max_entries entries (least recently used is evicted) and an entry expires ttl seconds after
+it was computed. resource is a cache of one entry without ttl, a new key (changed file) replaces the old object.
+Concurrent calls for the same key compute it once. cache_stats() gives hits, misses, evictions and estimated memory
+of entries of every cache.'''
+import functools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+_CACHES = []
+
+
+def file_stat_key(path):
+    '''(modification time, size) of file, None if it does not exist'''
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def size_of(obj, depth=3):
+    '''estimated memory of obj in bytes, columns and arrays are counted by their buffers (strings are not scanned)'''
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=False).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=False))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if depth > 0:
+        if isinstance(obj, (list, tuple)):
+            return sum(size_of(value, depth-1) for value in obj)
+        if isinstance(obj, dict):
+            return sum(size_of(value, depth-1) for value in obj.values())
+        if hasattr(obj, '__dict__'):
+            return sum(size_of(value, depth-1) for value in vars(obj).values())
+    return sys.getsizeof(obj)
+
+
+class BoundedCache:
+    '''thread safe lru cache with max no of entries and time to live'''
+
+    def __init__(self, name, max_entries=None, ttl=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        _CACHES.append(self)
+
+    def _lookup(self, key):
+        #returns (found, value), expired entry is removed
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires, size = entry
+        if expires is not None and time.monotonic() >= expires:
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key, compute):
+        '''value of key, computed by compute() on miss'''
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            #another thread may have computed it while this one waited
+            with self._lock:
+                found, value = self._lookup(key)
+                if found:
+                    self.hits += 1
+                    return value
+                self.misses += 1
+            value = compute()
+            with self._lock:
+                expires = time.monotonic()+self.ttl if self.ttl is not None else None
+                self._entries[key] = (value, expires, size_of(value))
+                self._entries.move_to_end(key)
+                while self.max_entries is not None and len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+                self._key_locks.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'cache': self.name, 'entries': len(self._entries), 'max_entries': self.max_entries, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'expirations': self.expirations,
+                    'memory_bytes': sum(size for value, expires, size in self._entries.values())}
+
+
+def cached(name=None, max_entries=128, ttl=None, key=None):
+    '''decorator caching results of function in a BoundedCache, key(*args, **kwargs) gives the cache key
+    (default is the arguments themselves), the cache is available as function.cache'''
+    def decorator(function):
+        cache = BoundedCache(name or function.__name__, max_entries, ttl)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs) if key is not None else (args, tuple(sorted(kwargs.items())))
+            return cache.get(cache_key, lambda: function(*args, **kwargs))
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+def resource(name=None, key=None):
+    '''decorator for a shared object (model, reference data) of the process, object is created again only when key changes'''
+    return cached(name, max_entries=1, key=key)
+
+def cache_stats():
+    '''stats of every cache of the process'''
+    return [cache.stats() for cache in _CACHES]
@@ -0,0 +1,92 @@
+'''indexes on prepared claims for selecting claims without scanning or copying the whole data
+
+KeyIndex keeps row positions of every value of a column (rows sorted by the value once), ClaimIndex has key indexes
+on Provider, BeneID and ClaimID and claims sorted by ClaimStartDt for date ranges. Selections return row positions
+in the sequence of claims, only selected rows are taken (materialized) by take().'''
+import numpy as np
+import pandas as pd
+
+from profiling import stage
+
+
+KEY_COLS = ('Provider', 'BeneID', 'ClaimID')
+DATE_COL = 'ClaimStartDt'
+
+
+class KeyIndex:
+    '''row positions of every value of a column'''
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values)
+        self.keys = pd.Index(uniques)
+        valid = codes >= 0
+        #positions of rows of a value are contiguous in order, in the sequence of rows
+        self.order = np.argsort(codes, kind='stable')[np.count_nonzero(~valid):]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[valid], minlength=len(uniques)))])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def key_positions(self, keys):
+        '''positions of keys in self.keys, -1 for keys not in index'''
+        return self.keys.get_indexer(keys)
+
+    def positions(self, key):
+        '''row positions of key, empty if key is not in index'''
+        i = self.key_positions([key])[0]
+        if i < 0:
+            return np.array([], dtype=np.intp)
+        return self.order[self.offsets[i]:self.offsets[i+1]]
+
+    def positions_of(self, keys):
+        '''row positions of any of keys, in the sequence of rows'''
+        parts = [self.positions(key) for key in dict.fromkeys(keys)]
+        return np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.intp)
+
+
+def _to_datetime(values):
+    #categorical (from prepared cache) columns are parsed once per category, not once per row
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        dates = pd.to_datetime(values.cat.categories).values
+        return np.where(values.cat.codes.values >= 0, dates[values.cat.codes.values], np.datetime64('NaT'))
+    return pd.to_datetime(values).values
+
+
+class ClaimIndex:
+    '''indexes of prepared claims on KEY_COLS and claim start date'''
+
+    def __init__(self, claims):
+        with stage('claim_index', len(claims)):
+            self.claims = claims
+            self.keys = dict((col, KeyIndex(claims[col])) for col in KEY_COLS)
+            dates = _to_datetime(claims[DATE_COL])
+            valid = ~np.isnat(dates)
+            self.date_order = np.flatnonzero(valid)[np.argsort(dates[valid], kind='stable')]
+            self.sorted_dates = dates[self.date_order]
+
+    def __len__(self):
+        return len(self.claims)
+
+    def values(self, col):
+        '''distinct values of an indexed column, for selectors'''
+        return self.keys[col].keys
+
+    def date_range(self):
+        '''first and last claim start date, None if there are no dates'''
+        if not len(self.sorted_dates):
+            return None
+        return pd.Timestamp(self.sorted_dates[0]), pd.Timestamp(self.sorted_dates[-1])
+
+    def select(self, col, values):
+        '''row positions of claims having any of values in an indexed column'''
+        return self.keys[col].positions_of(values)
+
+    def select_dates(self, start, end):
+        '''row positions of claims starting from start to end date (both inclusive)'''
+        low = np.searchsorted(self.sorted_dates, pd.Timestamp(start).to_datetime64(), side='left')
+        high = np.searchsorted(self.sorted_dates, pd.Timestamp(end).to_datetime64(), side='right')
+        return np.sort(self.date_order[low:high])
+
+    def take(self, positions):
+        '''dataframe of claims at row positions'''
+        return self.claims.iloc[positions]
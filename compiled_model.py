@@ -0,0 +1,275 @@
+'''XGB model compiled into flat numpy node arrays for fast in process prediction
+
+Every tree of XGB_Model.json is laid out as a complete binary tree of the depth of the deepest tree (children of node i
+are 2i+1 and 2i+2, a leaf above the last level is repeated down to it), and split feature, threshold and default
+direction of missing value of all trees are kept in contiguous arrays. Rows are routed through all trees together,
+one level at a time, with vectorized numpy operations, there is no DMatrix construction or call into xgboost, which
+is most of the time taken when only a few claims are scored.
+Features are compared with thresholds in float32 and leaf values are added tree by tree in float32 like xgboost does,
+so the raw scores (margins) are identical to xgboost's. Probability is sigmoid of margin computed as in xgboost, it can
+differ in the last bit of float32 when exp of the C library xgboost is built with rounds differently.
+
+Std Scaler can be fused into the model (fuse_scaler), the fused model takes unscaled features. Scaling is monotone,
+so every threshold t of a feature is replaced by the smallest float64 raw value x whose scaled value (as float32, which
+xgboost compares) is not less than t, and raw features are compared in float64. So the fused model routes every row
+exactly as the model does on scaled features, and predictions are identical without the scaling pass.
+
+usage for export:        python compiled_model.py fuse [--model XGB_Model.json] [--scaler std_scaler.bin] [--output fused_model.npz]
+usage for verification:  python compiled_model.py verify [--fused fused_model.npz]'''
+import argparse
+import json
+import sys
+import numpy as np
+
+
+FUSED_MODEL_PATH = 'fused_model.npz'
+#trees deeper than this would take 2**depth nodes each in the complete tree layout
+MAX_DEPTH = 16
+
+
+class CompiledModel:
+    '''gbtree binary:logistic model as complete binary trees of given depth in flat arrays,
+    internal nodes of tree t are at t*(2**depth-1) and its leaves at t*2**depth'''
+
+    def __init__(self, split_indices, split_conditions, default_left, leaf_values, depth, base_margin, n_features,
+                 feature_names_in_=None, source=None, split_features=None):
+        self.split_indices = split_indices
+        #float32 thresholds of model, float64 thresholds on raw features of fused model
+        self.split_conditions = split_conditions
+        self.default_left = default_left
+        self.leaf_values = leaf_values
+        self.depth = depth
+        self.base_margin = base_margin
+        self.n_features = n_features
+        #feature names of fused scaler, if any
+        self.feature_names_in_ = feature_names_in_
+        #checksums of model and scaler files the fused model was made from
+        self.source = source or {}
+        #sorted indices of features read by splits of the trees
+        self._split_features = None if split_features is None else np.asarray(split_features, dtype=np.int32)
+
+    @classmethod
+    def from_json(cls, path):
+        '''compiles model saved by XGBClassifier.save_model in json format'''
+        with open(path) as f:
+            learner = json.load(f)['learner']
+        objective = learner['objective']['name']
+        if objective != 'binary:logistic':
+            raise ValueError('only binary:logistic model can be compiled, '+path+' is '+objective)
+        base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+        trees = learner['gradient_booster']['model']['trees']
+        if any(any(tree['split_type']) for tree in trees):
+            raise ValueError('model having categorical splits can not be compiled')
+
+        depth = max(_tree_depth(tree['left_children'], tree['right_children']) for tree in trees)
+        if depth > MAX_DEPTH:
+            raise ValueError('trees deeper than '+str(MAX_DEPTH)+' levels can not be compiled')
+        n_internal, n_leaves = 2**depth-1, 2**depth
+        split_indices = np.zeros((len(trees), n_internal), dtype=np.int32)
+        split_conditions = np.zeros((len(trees), n_internal), dtype=np.float32)
+        default_left = np.zeros((len(trees), n_internal), dtype=bool)
+        leaf_values = np.zeros((len(trees), n_leaves), dtype=np.float32)
+        for t, tree in enumerate(trees):
+            conditions = np.array(tree['split_conditions'], dtype=np.float32)
+            #(node of tree, position in complete tree, level)
+            stack = [(0, 0, 0)]
+            while stack:
+                node, pos, level = stack.pop()
+                left = tree['left_children'][node]
+                if left == -1:
+                    #leaf value is kept in split_conditions, it covers all last level positions under pos
+                    first = pos
+                    for _ in range(depth-level):
+                        first = 2*first+1
+                    first -= n_internal
+                    leaf_values[t, first:first+2**(depth-level)] = conditions[node]
+                    continue
+                split_indices[t, pos] = tree['split_indices'][node]
+                split_conditions[t, pos] = conditions[node]
+                default_left[t, pos] = tree['default_left'][node]
+                stack.append((left, 2*pos+1, level+1))
+                stack.append((tree['right_children'][node], 2*pos+2, level+1))
+        split_features = sorted(set(feature for tree in trees
+                                    for left, feature in zip(tree['left_children'], tree['split_indices']) if left != -1))
+        return cls(split_indices.ravel(), split_conditions.ravel(), default_left.ravel(), leaf_values.ravel(), depth,
+                   np.float32(np.log(base_score/(1-base_score))), int(learner['learner_model_param']['num_feature']),
+                   split_features=split_features)
+
+    @property
+    def n_trees(self):
+        return len(self.leaf_values) >> self.depth
+
+    @property
+    def fused(self):
+        return self.split_conditions.dtype == np.float64
+
+    def split_features(self):
+        '''sorted indices of features read by any split of the trees, values of other features do not change predictions'''
+        if self._split_features is None:
+            #model saved without them, nodes under leaves above the last level are counted as splits on feature 0
+            self._split_features = np.unique(self.split_indices).astype(np.int32)
+        return self._split_features
+
+    def fuse_scaler(self, scaler, source=None):
+        '''returns model which takes unscaled features, fitted StandardScaler scaler is folded into its thresholds'''
+        if self.fused:
+            raise ValueError('model is already fused with a scaler')
+        mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None and scaler.with_mean else np.zeros(self.n_features)
+        scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None and scaler.with_std else np.ones(self.n_features)
+        thresholds = _raw_thresholds(self.split_conditions, mean[self.split_indices], scale[self.split_indices])
+        names = getattr(scaler, 'feature_names_in_', None)
+        return CompiledModel(self.split_indices, thresholds, self.default_left, self.leaf_values, self.depth, self.base_margin,
+                             self.n_features, None if names is None else list(names), source, self._split_features)
+
+    def save(self, path):
+        meta = {'depth': self.depth, 'base_margin': float(self.base_margin), 'n_features': self.n_features,
+                'feature_names_in_': self.feature_names_in_, 'source': self.source,
+                'split_features': self.split_features().tolist()}
+        with open(path, 'wb') as f:
+            np.savez(f, split_indices=self.split_indices, split_conditions=self.split_conditions,
+                     default_left=self.default_left, leaf_values=self.leaf_values, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path):
+        '''loads model saved by save (fused model exported by "python compiled_model.py fuse")'''
+        with np.load(path) as arrays:
+            meta = json.loads(str(arrays['meta']))
+            return cls(arrays['split_indices'], arrays['split_conditions'], arrays['default_left'], arrays['leaf_values'],
+                       meta['depth'], np.float32(meta['base_margin']), meta['n_features'], meta['feature_names_in_'],
+                       meta['source'], meta.get('split_features'))
+
+    def predict_margin(self, X, block_rows=10000):
+        '''raw score (log odds) of rows of feature matrix X, rows are evaluated in blocks of block_rows rows'''
+        #features are compared in the precision of thresholds, float32 as in xgboost or float64 for fused model
+        X = np.asarray(X, dtype=self.split_conditions.dtype)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError('feature matrix should have '+str(self.n_features)+' columns, got shape '+str(X.shape))
+        margin = np.empty(len(X), dtype=np.float32)
+        for start in range(0, len(X), block_rows):
+            margin[start:start+block_rows] = self._block_margin(np.ascontiguousarray(X[start:start+block_rows]))
+        return margin
+
+    def _block_margin(self, X):
+        n_internal = 2**self.depth-1
+        flat_X = X.ravel()
+        #int32 positions, as a block of rows has less than 2**31 feature values
+        row_offsets = (np.arange(len(X), dtype=np.int32)*self.n_features)[:, None]
+        tree_offsets = np.arange(self.n_trees, dtype=np.int32)*n_internal
+        leaf_offsets = np.arange(self.n_trees, dtype=np.int32)*2**self.depth
+        has_missing = np.isnan(flat_X).any()
+        pos = np.zeros((len(X), self.n_trees), dtype=np.int32)
+        for _ in range(self.depth):
+            nodes = pos+tree_offsets
+            values = flat_X.take(row_offsets+self.split_indices.take(nodes))
+            go_right = ~(values < self.split_conditions.take(nodes))
+            if has_missing:
+                go_right &= ~(np.isnan(values) & self.default_left.take(nodes))
+            pos = 2*pos+1+go_right
+        leaf_values = self.leaf_values.take(pos-n_internal+leaf_offsets)
+        #margin is accumulated tree by tree in float32 (cumsum adds in sequence), same as xgboost
+        leaf_values = np.concatenate([np.full((len(X), 1), self.base_margin, dtype=np.float32), leaf_values], axis=1)
+        return np.cumsum(leaf_values, axis=1, dtype=np.float32)[:, -1]
+
+    def predict_proba(self, X):
+        '''same as XGBClassifier.predict_proba, returns array of probabilities of class 0 and 1'''
+        proba = sigmoid(self.predict_margin(X))
+        return np.column_stack([1-proba, proba])
+
+    def predict(self, X):
+        '''same as XGBClassifier.predict, label 1 if probability of fraud is more than 0.5'''
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+
+def sigmoid(margin):
+    '''sigmoid of float32 margin as computed by xgboost, 1/(exp(min(-x, 88.7)) + 1) in float32'''
+    exp = np.exp(np.minimum(-margin, np.float32(88.7)).astype(np.float64)).astype(np.float32)
+    return np.float32(1)/(exp+np.float32(1))
+
+def _ordered(values):
+    #float64 as int64 in the same order as the floats, consecutive floats are consecutive ints
+    bits = values.view(np.int64)
+    return np.where(bits < 0, -1-(bits & np.int64(0x7FFFFFFFFFFFFFFF)), bits)
+
+def _from_ordered(keys):
+    bits = np.where(keys < 0, (-1-keys) | np.int64(np.iinfo(np.int64).min), keys)
+    return bits.view(np.float64)
+
+def _raw_thresholds(thresholds, mean, scale):
+    '''smallest float64 x for every float32 threshold t such that float32((x-mean)/scale) >= t, by bisection on floats'''
+    low = _ordered(np.full(len(thresholds), -np.inf))
+    high = _ordered(np.full(len(thresholds), np.inf))
+    with np.errstate(over='ignore', invalid='ignore'):
+        #64 halvings reach consecutive floats, after that mid is low and nothing changes
+        for _ in range(70):
+            mid = (low >> 1)+(high >> 1)+(low & high & 1)
+            above = ((_from_ordered(mid)-mean)/scale).astype(np.float32) >= thresholds
+            high = np.where(above, mid, high)
+            low = np.where(above, low, mid)
+    return _from_ordered(high)
+
+def _tree_depth(left_children, right_children):
+    #no of splits from root to the deepest leaf
+    depth = 0
+    level = [0]
+    while True:
+        level = [child for node in level if left_children[node] != -1 for child in (left_children[node], right_children[node])]
+        if not level:
+            return depth
+        depth += 1
+
+
+def verify_fused(fused, xgb_clf, scaler, files, chunk_size=20000):
+    '''compares fused model on unscaled features with xgboost model on scaled features for claims of files,
+    returns dict of no of claims, claims having different margin or label and max difference of probability'''
+    #imported here, as these modules need model registry which imports this module
+    from data_prep import get_train_data, iter_prepared_chunks
+    from feature_engine import feature_engg_from_stats
+    from reference_stats import fit_reference_stats, load_reference_stats_if_fitted
+
+    stats = load_reference_stats_if_fitted() or fit_reference_stats(get_train_data())
+    report = {'claims': 0, 'margin_mismatch': 0, 'label_mismatch': 0, 'max_proba_diff': 0.0}
+    for chunk in iter_prepared_chunks(files, chunk_size):
+        features = feature_engg_from_stats(chunk, stats)
+        scaled = scaler.transform(features)
+        margin = xgb_clf.get_booster().inplace_predict(scaled, predict_type='margin')
+        proba = xgb_clf.predict_proba(scaled)[:, 1]
+        fused_proba = fused.predict_proba(features)[:, 1]
+        report['claims'] += len(chunk)
+        report['margin_mismatch'] += int((fused.predict_margin(features) != margin).sum())
+        report['label_mismatch'] += int(((fused_proba > 0.5) != (proba > 0.5)).sum())
+        report['max_proba_diff'] = max(report['max_proba_diff'], float(np.abs(fused_proba-proba).max()))
+    return report
+
+
+def main():
+    from joblib import load
+    from data_prep import TEST_FILES, TRAIN_FILES
+    from model_registry import MODEL_PATH, SCALER_PATH, file_checksum, load_xgb_model
+
+    parser = argparse.ArgumentParser(description='export XGB model fused with Std Scaler, or verify exported fused model')
+    parser.add_argument('action', choices=['fuse', 'verify'])
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    parser.add_argument('--fused', '--output', default=FUSED_MODEL_PATH, help='fused model file')
+    args = parser.parse_args()
+
+    if args.action == 'fuse':
+        source = {'model': file_checksum(args.model), 'scaler': file_checksum(args.scaler)}
+        fused = CompiledModel.from_json(args.model).fuse_scaler(load(args.scaler), source)
+        fused.save(args.fused)
+        print('model fused with scaler saved to', args.fused)
+        return
+
+    fused = CompiledModel.load(args.fused)
+    xgb_clf, scaler = load_xgb_model(args.model), load(args.scaler)
+    failed = False
+    for name, files in (('test', TEST_FILES), ('train', TRAIN_FILES)):
+        report = verify_fused(fused, xgb_clf, scaler, files)
+        print(name, 'data:', json.dumps(report))
+        failed = failed or report['margin_mismatch'] > 0 or report['label_mismatch'] > 0
+    print('fused model predictions are', 'NOT identical' if failed else 'identical')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import time
+import numpy as np
+import pandas as pd
+
+from caching import resource
+from profiling import record, stage
+
+
+TRAIN_FILES = ('archive/Train_Beneficiarydata-1542865627584.csv',
+               'archive/Train_Inpatientdata-1542865627584.csv',
+               'archive/Train_Outpatientdata-1542865627584.csv')
+TEST_FILES = ('archive/Test_Beneficiarydata-1542969243754.csv',
+              'archive/Test_Inpatientdata-1542969243754.csv',
+              'archive/Test_Outpatientdata-1542969243754.csv')
+
+# explicit dtypes for id and code columns so that every file (or chunk of file) is parsed with same types,
+# otherwise a chunk having only numeric looking dx codes gets parsed as numbers and does not match other chunks
+CLAIM_DTYPES = dict([(col, str) for col in ['BeneID', 'ClaimID', 'Provider', 'AttendingPhysician', 'OperatingPhysician',
+                                            'OtherPhysician', 'ClmAdmitDiagnosisCode', 'DiagnosisGroupCode']] +
+                    [('ClmDiagnosisCode_'+str(i), str) for i in range(1, 11)] +
+                    [('ClmProcedureCode_'+str(i), 'float64') for i in range(1, 7)])
+
+
+CHRONIC_COLS = ['ChronicCond_Alzheimer', 'ChronicCond_Heartfailure', 'ChronicCond_KidneyDisease', 'ChronicCond_Cancer',
+                'ChronicCond_ObstrPulmonary', 'ChronicCond_Depression', 'ChronicCond_Diabetes', 'ChronicCond_IschemicHeart',
+                'ChronicCond_Osteoporasis', 'ChronicCond_rheumatoidarthritis', 'ChronicCond_stroke']
+AMOUNT_COLS = ['InscClaimAmtReimbursed', 'DeductibleAmtPaid', 'IPAnnualReimbursementAmt', 'IPAnnualDeductibleAmt',
+               'OPAnnualReimbursementAmt', 'OPAnnualDeductibleAmt']
+
+
+def _float32(values):
+    #amounts are whole numbers, float32 holds them exactly, other values are kept as float64
+    values = np.asarray(values, dtype=np.float64)
+    narrow = values.astype(np.float32)
+    return narrow if np.array_equal(narrow, values, equal_nan=True) else values
+
+def _narrow_amounts(data):
+    for col in AMOUNT_COLS:
+        if col in data.columns:
+            data[col] = _float32(data[col].values)
+    return data
+
+def _column(parts, col, rows):
+    #column of union of claim parts at rows, parts not having the column give missing values (as pd.concat does)
+    with_col = [part[col] for part in parts if col in part.columns]
+    values = pd.concat([part[col] if col in part.columns else with_col[0].iloc[:0].reindex(pd.RangeIndex(len(part)))
+                        for part in parts], ignore_index=True).values
+    return pd.Series(values.take(rows), name=col, copy=False)
+
+def preparing_data(data_ben, data_inp, data_out):
+    '''this function prepares complete dataset by merging three dataset- 1. Beneficiary data, 2.Inpatient data, 3. Outpatient data
+    and also merges with labeled data available in train csv file
+    merged data is built column by column, each column copied once, instead of concatenating and merging whole data'''
+    with stage('preparing_data') as call:
+        data_ben = prepare_beneficiary(data_ben)
+        parts = [_narrow_amounts(add_admit_days(data_inp)), _narrow_amounts(data_out)]
+
+        #Lets make union of Inpatienta and outpatient data .
+        #We will use all keys in outpatient data as we want to make union and dont want duplicate columns from both tables.
+        claim_cols = list(data_inp.columns)+[col for col in data_out.columns if col not in data_inp.columns]
+
+        #Lets join All patient data with beneficiary details based on 'BeneID' (inner join), beneficiary columns are
+        #looked up by position of BeneID in beneficiary data
+        bene_ids = np.concatenate([part['BeneID'].values for part in parts])
+        positions = pd.Index(data_ben['BeneID']).get_indexer(bene_ids)
+        #rows in same sequence as pd.merge(how='inner') gives them, grouped by BeneID in order of its first claim
+        rows = np.argsort(pd.factorize(bene_ids)[0], kind='stable')
+        rows = rows[positions[rows] >= 0]
+        positions = positions[rows]
+
+        columns = [_column(parts, col, rows) for col in claim_cols]
+        columns += [pd.Series(data_ben[col].values.take(positions), name=col, copy=False)
+                    for col in data_ben.columns if col != 'BeneID']
+        merged_data = pd.concat(columns, axis=1, copy=False)
+        call.rows = len(merged_data)
+
+    return merged_data
+
+def prepare_beneficiary(data_ben):
+    '''recodes chronic conditions and renal disease indicator, adds Age and WhetherDead columns to beneficiary data
+    flags are int8, Age int16 and amounts float32, columns are replaced one by one without copying the whole data'''
+    #Replacing 2 with 0 for chronic conditions ,that means chroniv condition No is 0 and yes is 1
+    for col in CHRONIC_COLS:
+        values = data_ben[col].values
+        data_ben[col] = np.where(values == 2, 0, values).astype(np.int8)
+
+    values = data_ben['RenalDiseaseIndicator'].values
+    data_ben['RenalDiseaseIndicator'] = np.where(values == 'Y', 1, values).astype(np.int8)
+    _narrow_amounts(data_ben)
+
+    # Lets Create Age column to the dataset
+    data_ben['DOB'] = pd.to_datetime(data_ben['DOB'] , format = '%Y-%m-%d')
+    data_ben['DOD'] = pd.to_datetime(data_ben['DOD'],format = '%Y-%m-%d',errors='ignore')
+    # As we see that last DOD value is 2009-12-01 ,which means Beneficiary Details data is of year 2009.
+    # so we will calculate age of other benficiaries for year 2009.
+    last_day = data_ben['DOD'].fillna(pd.to_datetime('2009-12-01' , format = '%Y-%m-%d'))
+    data_ben['Age'] = np.round((last_day - data_ben['DOB']).dt.days.values/365).astype(np.int16)
+
+    #Lets create a new variable 'WhetherDead' with flag 1 means Dead and 0 means not Dead
+    data_ben['WhetherDead'] = data_ben['DOD'].notna().values.astype(np.int8)
+    return data_ben
+
+def add_admit_days(data_inp):
+    '''parses admission and discharge dates of inpatient data and adds AdmitForDays column'''
+    #As patient can be admitted for atleast 1 day, so we will add 1 to the difference of Discharge Date and Admission Date
+    data_inp['AdmissionDt'] = pd.to_datetime(data_inp['AdmissionDt'] , format = '%Y-%m-%d')
+    data_inp['DischargeDt'] = pd.to_datetime(data_inp['DischargeDt'],format = '%Y-%m-%d')
+    data_inp['AdmitForDays'] = _float32((data_inp['DischargeDt'] - data_inp['AdmissionDt']).dt.days.values+1)
+    return data_inp
+
+def read_raw_data(files):
+    '''reads beneficiary, inpatient and outpatient csv files and returns the three raw dataframes'''
+    ben_file, inp_file, out_file = files
+    with stage('read_csv') as call:
+        raw_data = pd.read_csv(ben_file), pd.read_csv(inp_file, dtype=CLAIM_DTYPES), pd.read_csv(out_file, dtype=CLAIM_DTYPES)
+        call.rows = sum(len(data) for data in raw_data)
+    return raw_data
+
+def _add_time(timings, stage, start, rows=None):
+    #stage time goes to the timings dict and to active profiler (see profiling.py)
+    seconds = time.perf_counter()-start
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0)+seconds
+    record(stage, seconds, rows)
+
+def iter_prepared_chunks(files, chunk_size=100000, timings=None):
+    '''streaming version of preparing_data, yields prepared claims (same columns as preparing_data) in chunks of chunk_size claims
+    only beneficiary data (one row per beneficiary) is kept in memory, indexed on BeneID, and each chunk of inpatient
+    and then outpatient claims is joined with it, so memory does not grow with size of claim files.
+    time taken in reading and preparing is added to 'read_csv' and 'preparing_data' stages of timings dict, if passed'''
+    ben_file, inp_file, out_file = files
+    start = time.perf_counter()
+    data_ben = pd.read_csv(ben_file)
+    _add_time(timings, 'read_csv', start, len(data_ben))
+    start = time.perf_counter()
+    data_ben = prepare_beneficiary(data_ben).set_index('BeneID')
+    _add_time(timings, 'preparing_data', start, len(data_ben))
+
+    #columns of claims are same as union of inpatient and outpatient data, as in preparing_data
+    claim_cols = list(pd.read_csv(inp_file, nrows=0).columns)+['AdmitForDays']
+    n_rows = 0
+    for path, inpatient in ((inp_file, True), (out_file, False)):
+        reader = iter(pd.read_csv(path, dtype=CLAIM_DTYPES, chunksize=chunk_size))
+        while True:
+            start = time.perf_counter()
+            chunk = next(reader, None)
+            _add_time(timings, 'read_csv', start, len(chunk) if chunk is not None else 0)
+            if chunk is None:
+                break
+            start = time.perf_counter()
+            if inpatient:
+                chunk = add_admit_days(chunk)
+            else:
+                chunk = chunk.reindex(columns=claim_cols+[col for col in chunk.columns if col not in claim_cols])
+                chunk['AdmissionDt'] = pd.to_datetime(chunk['AdmissionDt'])
+                chunk['DischargeDt'] = pd.to_datetime(chunk['DischargeDt'])
+                chunk['DiagnosisGroupCode'] = chunk['DiagnosisGroupCode'].astype(object)
+            chunk = _narrow_amounts(chunk)
+            #index lookup of beneficiary details instead of merging whole data, inner join as in preparing_data
+            prepared = chunk.join(data_ben, on='BeneID', how='inner')
+            prepared.index = pd.RangeIndex(n_rows, n_rows+len(prepared))
+            n_rows += len(prepared)
+            _add_time(timings, 'preparing_data', start, len(prepared))
+            if len(prepared):
+                yield prepared
+
+def load_train_data(use_cache=True):
+    '''loads train csv files and returns the prepared (merged) train data, it is used as reference data for feature engineering
+    prepared data is loaded from columnar cache (see prepared_cache.py), csv files are parsed only when they change'''
+    if use_cache:
+        #imported here as prepared_cache itself uses preparing_data of this module
+        from prepared_cache import load_or_prepare
+        return load_or_prepare(TRAIN_FILES)
+    return preparing_data(*read_raw_data(TRAIN_FILES))
+
+def train_files_key():
+    '''fingerprint of content of train files'''
+    #imported here as prepared_cache itself uses preparing_data of this module
+    from prepared_cache import files_fingerprint
+    return files_fingerprint(TRAIN_FILES)
+
+@resource('train_data', key=train_files_key)
+def get_train_data():
+    '''returns prepared train data, loaded once per process and loaded again only if train files change'''
+    return load_train_data()
@@ -0,0 +1,213 @@
+'''single pass feature engine on aggregate stats
+
+executes the declarative feature spec (feature_spec.py) on reference stats (reference_stats.AggregateState).
+Claims of the batch not in the stats are aggregated once per key set, then for every key set its rows are looked up
+(one hash of the keys for the whole batch) and all of its mean/count features are computed as one vectorized block.
+TF-IDF features come from the sparse tf-idf index of the stats (tf_idf.py).
+Blocks (base columns, every key set, every tf-idf column) are independent of each other and can be computed by
+a pool of threads, they only read the encoded batch and stats and each writes its own columns of the matrix.
+Every block is written straight into its columns of one feature matrix, in the sequence of FEATURE_COLUMNS
+(the sequence Std Scaler and XGB model were trained on), so there is no merge or column reordering.
+Every block is a stage of the active profiler (profiling.py): 'encode_claims', 'feature_block:base',
+'feature_block:<keys joined by +>' and 'tf_idf:<column>'.
+A FeaturePlan prunes the work to a subset of features, plan_for_model keeps only the features read by splits of the
+model (CompiledModel.split_features): key sets and tf-idf columns none of whose features are read are not encoded,
+aggregated or looked up, and the columns of features not computed are 0 placeholders (Std Scaler needs all columns).'''
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+import numpy as np
+import pandas as pd
+
+from feature_spec import AGG_SPEC, BASE_COLS, DUMMY_COLS, FEATURE_COLUMNS, TF_IDF_COLS
+from profiling import stage
+from reference_stats import aggregate, encode_claims, stat_plan
+
+
+FEATURE_INDEX = dict((name, i) for i, name in enumerate(FEATURE_COLUMNS))
+#no of threads computing feature blocks, blocks of small batches are computed one after another as
+#starting threads would take longer than computing them
+FEATURE_WORKERS = int(os.environ.get('FEATURE_WORKERS', 1))
+PARALLEL_MIN_ROWS = 10000
+
+
+def check_feature_order(scaler):
+    '''raises ValueError if features are not generated in the sequence scaler was fitted on'''
+    names = getattr(scaler, 'feature_names_in_', None)
+    if names is not None and list(names) != FEATURE_COLUMNS:
+        raise ValueError('sequence of generated features is different from the sequence Std Scaler was trained on')
+
+class FeaturePlan:
+    '''feature blocks and columns of claims needed to compute given features (all FEATURE_COLUMNS by default)'''
+
+    def __init__(self, features=None):
+        features = set(FEATURE_COLUMNS if features is None else features)
+        unknown = features-set(FEATURE_COLUMNS)
+        if unknown:
+            raise ValueError('unknown features: '+', '.join(sorted(unknown)))
+        self.features = features
+        self.base_cols = [col for col in BASE_COLS if col in features]
+        self.dummy_cols = [dummy for dummy in DUMMY_COLS if dummy[0] in features]
+        self.agg_spec = dict((keys, [feature for feature in spec if feature[0] in features]) for keys, spec in AGG_SPEC.items()
+                             if any(feature[0] in features for feature in spec))
+        self.tf_idf_cols = [col for col in TF_IDF_COLS if any(col+suffix in features for suffix in ('TF', '_IDF', 'TF-IDF'))]
+        #ClaimID finds new claims of the batch, tf-idf terms are counted per provider
+        plan = stat_plan()
+        self.encode_cols = {'ClaimID'}
+        for keys in self.agg_spec:
+            self.encode_cols.update(keys, *plan[keys])
+        for col in self.tf_idf_cols:
+            self.encode_cols.update(('Provider', col))
+        #key sets of stats read by the features, tf-idf reads term counts, codes per provider and claims per code
+        self.stat_keys = list(dict.fromkeys(list(self.agg_spec)+[keys for col in self.tf_idf_cols
+                                                                 for keys in (('Provider', col), ('Provider',), (col,))]))
+        self.computed = np.array([i for i, name in enumerate(FEATURE_COLUMNS) if name in features], dtype=np.intp)
+        self.placeholders = np.array([i for i, name in enumerate(FEATURE_COLUMNS) if name not in features], dtype=np.intp)
+
+    def __repr__(self):
+        return 'FeaturePlan(%d of %d features, %d key sets, %d tf-idf columns)' % (
+            len(self.computed), len(FEATURE_COLUMNS), len(self.agg_spec), len(self.tf_idf_cols))
+
+
+FULL_PLAN = FeaturePlan()
+
+@lru_cache(maxsize=8)
+def _plan(features):
+    return FeaturePlan(features)
+
+def plan_for_model(model):
+    '''plan of features read by splits of compiled (or fused) model, all features if model is not on FEATURE_COLUMNS'''
+    if model.n_features != len(FEATURE_COLUMNS):
+        return FULL_PLAN
+    return _plan(frozenset(FEATURE_COLUMNS[i] for i in model.split_features()))
+
+def lookup(table, encoded, keys):
+    '''returns rows of keyed table aligned with rows of encoded claims as 2d array, rows whose key is nan or not in table are nan'''
+    key_codes = [encoded[key].values for key in keys]
+    valid = np.logical_and.reduce([codes >= 0 for codes in key_codes])
+    values = np.full((len(encoded), len(table.columns)), np.nan)
+    if valid.any():
+        if len(keys) == 1:
+            index = pd.Index(key_codes[0][valid])
+        else:
+            index = pd.MultiIndex.from_arrays([codes[valid] for codes in key_codes])
+        values[valid] = table.reindex(index).values
+    return values
+
+def _key_rows(stats, batch_table, encoded, keys, batch_keys):
+    '''rows of reference table of the keys with contribution of new (not in reference) claims of the batch added,
+    returns 2d array aligned with claims and dict of stat column -> its position in the array'''
+    table = stats.tables[keys]
+    rows = lookup(table, encoded, keys)
+    if batch_table is not None:
+        batch_rows = lookup(batch_table[table.columns], encoded, batch_keys)
+        both_nan = np.isnan(rows) & np.isnan(batch_rows)
+        rows = np.nan_to_num(rows)+np.nan_to_num(batch_rows)
+        rows[both_nan] = np.nan
+    return rows, dict((col, i) for i, col in enumerate(table.columns))
+
+def _agg_block(put, rows, positions, features):
+    #all mean features of a key set are divided in one go, count features are row counts
+    means = [(FEATURE_INDEX[name], positions[value+'_sum'], positions[value+'_count']) for name, op, value in features if op == 'mean']
+    if means:
+        out, sums, counts = (list(idx) for idx in zip(*means))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            put(out, rows[:, sums]/rows[:, counts])
+    counts = [FEATURE_INDEX[name] for name, op, value in features if op == 'count']
+    if counts:
+        put(counts, rows[:, [positions['_rows']]])
+
+def _run_blocks(blocks, workers, rows=None):
+    '''runs (stage name, block) pairs, every block is timed as a stage of active profiler'''
+    def run(name, block):
+        with stage(name, rows):
+            block()
+
+    #blocks write to their own columns of the matrix, so they can run in any sequence
+    if workers > 1 and len(blocks) > 1:
+        #threads of pool do not see the active profiler, so every block runs in a copy of the caller's context
+        contexts = [contextvars.copy_context() for _ in blocks]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            #list() raises the exception of a failed block, if any
+            list(pool.map(lambda context, block: context.run(run, *block), contexts, blocks))
+    else:
+        for name, block in blocks:
+            run(name, block)
+
+def _scaler_params(scaler):
+    #mean and scale of fitted StandardScaler, as it applies them
+    n_features = len(FEATURE_COLUMNS)
+    mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None and scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None and scaler.with_std else np.ones(n_features)
+    return mean, scale
+
+def feature_engg_from_stats(test_data, stats, workers=None, groups=None, plan=None, scaler=None, min_rows=None):
+    '''same as feature_engg but uses precomputed reference stats instead of aggregating train data,
+    returns unscaled features dataframe in the sequence of FEATURE_COLUMNS
+    with workers > 1 (default FEATURE_WORKERS) feature blocks of batches of at least min_rows claims
+    (default PARALLEL_MIN_ROWS, 0 to use the threads for any batch) are computed in a pool of that many threads.
+    groups (int array, one per claim) featurizes several batches in one call, features of each claim are same as
+    if its group was featurized alone (claims of other groups are not aggregated with it)
+    plan (FeaturePlan) computes only its features, other columns are 0
+    with scaler (fitted Std Scaler) every block is scaled as it is written and a float32 array of scaled features is
+    returned, the design matrix XGB model takes without conversion (xgboost compares features in float32)'''
+    if plan is None:
+        plan = FULL_PLAN
+    if workers is None:
+        workers = FEATURE_WORKERS
+    if len(test_data) < (PARALLEL_MIN_ROWS if min_rows is None else min_rows):
+        workers = 1
+    with stage('encode_claims', len(test_data)):
+        #ids of batch are encoded with vocabulary of stats, ids not seen in reference get codes after it
+        encoded = encode_claims(test_data, stats.vocab, cols=plan.encode_cols)
+        new = stats.new_claim_mask(encoded['ClaimID'].values, groups)
+        #batch aggregates are keyed on group too, so claims see new claims of their own group only
+        group_keys = ()
+        if groups is not None:
+            encoded['_group'] = np.asarray(groups, dtype=np.int32)
+            group_keys = ('_group',)
+        new_encoded = encoded[new] if new.any() else None
+        stat_cols = stat_plan()
+        if plan.tf_idf_cols:
+            tf_idf_index = stats.tf_idf_index()
+            n_providers = tf_idf_index.corpus_size(encoded, new, groups)
+
+    #fortran order is the layout of columns in a pandas dataframe, so the frame below is built without copy
+    matrix = np.empty((len(test_data), len(FEATURE_COLUMNS)), dtype=np.float64 if scaler is None else np.float32, order='F')
+    matrix[:, plan.placeholders] = 0
+    if scaler is not None:
+        mean, scale = _scaler_params(scaler)
+
+    def put(cols, values):
+        #nan features are 0 as in feature_engg, scaling is done in float64 as Std Scaler does, then stored as float32
+        values = np.asarray(values, dtype=np.float64)
+        values = np.where(np.isnan(values), 0.0, values)
+        if scaler is not None:
+            values = (values-mean[cols])/scale[cols]
+        matrix[:, cols] = values
+
+    def agg_block(keys):
+        batch_table = aggregate(new_encoded, group_keys+keys, *stat_cols[keys]) if new_encoded is not None else None
+        rows, positions = _key_rows(stats, batch_table, encoded, keys, group_keys+keys)
+        _agg_block(put, rows, positions, plan.agg_spec[keys])
+
+    def tf_idf_block(col):
+        for name, values in tf_idf_index.column_features(col, encoded, new, n_providers, groups).items():
+            if name in plan.features:
+                put(FEATURE_INDEX[name], values)
+
+    def base_block():
+        for col in plan.base_cols:
+            put(FEATURE_INDEX[col], test_data[col].values)
+        for dummy, source, category in plan.dummy_cols:
+            put(FEATURE_INDEX[dummy], test_data[source].astype(str).values == category)
+
+    blocks = ([('feature_block:base', base_block)] if plan.base_cols or plan.dummy_cols else [])
+    blocks += [('feature_block:'+'+'.join(keys), partial(agg_block, keys)) for keys in plan.agg_spec]
+    blocks += [('tf_idf:'+col, partial(tf_idf_block, col)) for col in plan.tf_idf_cols]
+    _run_blocks(blocks, workers, len(test_data))
+
+    if scaler is not None:
+        return matrix
+    return pd.DataFrame(matrix, index=test_data.index, columns=FEATURE_COLUMNS)
@@ -0,0 +1,337 @@
+import pandas as pd
+import numpy as np
+
+from data_prep import get_train_data
+from model_registry import get_scaler
+from prepared_cache import to_plain_dtypes
+
+
+def feature_engg(test_data, train_data=None):
+    '''this function will generate data point after feature engineering on raw data passed
+    train_data is prepared train data used as reference, if not passed it is loaded once per process'''
+    #storing test data columns for merging by these columns
+    col_merge=test_data.columns
+
+    ## Lets add both test and train datasets for generting accurate feature engineered data
+    if train_data is None:
+        train_data = get_train_data()
+    train_test_merged = pd.concat([test_data, train_data[col_merge]])
+    #data loaded from columnar cache has categorical and float32 columns, grouping is done on original dtypes
+    train_test_merged = to_plain_dtypes(train_test_merged)
+    #remove duplicate entriesu
+    train_test_merged = train_test_merged.drop_duplicates(subset='ClaimID')
+    
+    #average feature grouped by provider
+    train_test_merged["PerProviderAvg_InscClaimAmtReimbursed"]=train_test_merged.groupby('Provider')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerProviderAvg_DeductibleAmtPaid"]=train_test_merged.groupby('Provider')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerProviderAvg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('Provider')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerProviderAvg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('Provider')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerProviderAvg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('Provider')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerProviderAvg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('Provider')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerProviderAvg_Age"]=train_test_merged.groupby('Provider')['Age'].transform('mean')
+    train_test_merged["PerProviderAvg_NoOfMonths_PartACov"]=train_test_merged.groupby('Provider')['NoOfMonths_PartACov'].transform('mean')
+    train_test_merged["PerProviderAvg_NoOfMonths_PartBCov"]=train_test_merged.groupby('Provider')['NoOfMonths_PartBCov'].transform('mean')
+    train_test_merged["PerProviderAvg_AdmitForDays"]=train_test_merged.groupby('Provider')['AdmitForDays'].transform('mean')
+    #defragmenting dataframe, since after each section of preprocessing dataframe is getting larger this increases time and space complexity
+    #so to reduce this we are merging train data and test data after generating some subsection of preprocessing
+    #and then we are removing generated columns in train data to reduce space complexity
+    # we are doing so because we only require test so after generating features for test data are deleting from train data 
+    #this below line generates list of columns that only need to be merged and also in the same order as it was originaly generated in train data
+    #maintaining sequence is mandetaory as Std Scaler preprocess in the same sequence as it was trained
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data[['ClaimID']].merge(train_test_merged, on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by Ben ID
+    train_test_merged["PerBeneIDAvg_InscClaimAmtReimbursed"]=train_test_merged.groupby('BeneID')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerBeneIDAvg_DeductibleAmtPaid"]=train_test_merged.groupby('BeneID')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerBeneIDAvg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('BeneID')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerBeneIDAvg_AdmitForDays"]=train_test_merged.groupby('BeneID')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by attending physician
+    train_test_merged["PerAttendingPhysicianAvg_InscClaimAmtReimbursed"]=train_test_merged.groupby('AttendingPhysician')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerAttendingPhysicianAvg_DeductibleAmtPaid"]=train_test_merged.groupby('AttendingPhysician')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerAttendingPhysicianAvg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('AttendingPhysician')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerAttendingPhysicianAvg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('AttendingPhysician')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerAttendingPhysicianAvg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('AttendingPhysician')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerAttendingPhysicianAvg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('AttendingPhysician')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerAttendingPhysicianAvg_AdmitForDays"]=train_test_merged.groupby('AttendingPhysician')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    to_be_ret = temp_cols_list
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by operating physician
+    train_test_merged["PerOperatingPhysicianAvg_InscClaimAmtReimbursed"]=train_test_merged.groupby('OperatingPhysician')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerOperatingPhysicianAvg_DeductibleAmtPaid"]=train_test_merged.groupby('OperatingPhysician')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerOperatingPhysicianAvg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('OperatingPhysician')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerOperatingPhysicianAvg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('OperatingPhysician')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerOperatingPhysicianAvg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('OperatingPhysician')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerOperatingPhysicianAvg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('OperatingPhysician')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerOperatingPhysicianAvg_AdmitForDays"]=train_test_merged.groupby('OperatingPhysician')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by dx code group
+    train_test_merged["PerDiagnosisGroupCodeAvg_InscClaimAmtReimbursed"]=train_test_merged.groupby('DiagnosisGroupCode')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerDiagnosisGroupCodeAvg_DeductibleAmtPaid"]=train_test_merged.groupby('DiagnosisGroupCode')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerDiagnosisGroupCodeAvg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('DiagnosisGroupCode')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerDiagnosisGroupCodeAvg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('DiagnosisGroupCode')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerDiagnosisGroupCodeAvg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('DiagnosisGroupCode')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerDiagnosisGroupCodeAvg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('DiagnosisGroupCode')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerDiagnosisGroupCodeAvg_AdmitForDays"]=train_test_merged.groupby('DiagnosisGroupCode')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by admit dx code
+    train_test_merged["PerClmAdmitDiagnosisCodeAvg_InscClaimAmtReimbursed"]=train_test_merged.groupby('ClmAdmitDiagnosisCode')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerClmAdmitDiagnosisCodeAvg_DeductibleAmtPaid"]=train_test_merged.groupby('ClmAdmitDiagnosisCode')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerClmAdmitDiagnosisCodeAvg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmAdmitDiagnosisCode')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmAdmitDiagnosisCodeAvg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmAdmitDiagnosisCode')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmAdmitDiagnosisCodeAvg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmAdmitDiagnosisCode')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmAdmitDiagnosisCodeAvg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmAdmitDiagnosisCode')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmAdmitDiagnosisCodeAvg_AdmitForDays"]=train_test_merged.groupby('ClmAdmitDiagnosisCode')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by claim procedure code 1
+    train_test_merged["PerClmProcedureCode_1Avg_InscClaimAmtReimbursed"]=train_test_merged.groupby('ClmProcedureCode_1')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerClmProcedureCode_1Avg_DeductibleAmtPaid"]=train_test_merged.groupby('ClmProcedureCode_1')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerClmProcedureCode_1Avg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmProcedureCode_1')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmProcedureCode_1Avg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmProcedureCode_1')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmProcedureCode_1Avg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmProcedureCode_1')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmProcedureCode_1Avg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmProcedureCode_1')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmProcedureCode_1Avg_AdmitForDays"]=train_test_merged.groupby('ClmProcedureCode_1')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by claim procedure code 2
+    train_test_merged["PerClmProcedureCode_2Avg_InscClaimAmtReimbursed"]=train_test_merged.groupby('ClmProcedureCode_2')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerClmProcedureCode_2Avg_DeductibleAmtPaid"]=train_test_merged.groupby('ClmProcedureCode_2')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerClmProcedureCode_2Avg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmProcedureCode_2')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmProcedureCode_2Avg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmProcedureCode_2')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmProcedureCode_2Avg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmProcedureCode_2')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmProcedureCode_2Avg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmProcedureCode_2')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmProcedureCode_2Avg_AdmitForDays"]=train_test_merged.groupby('ClmProcedureCode_2')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by claim dx code 1
+    train_test_merged["PerClmDiagnosisCode_1Avg_InscClaimAmtReimbursed"]=train_test_merged.groupby('ClmDiagnosisCode_1')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1Avg_DeductibleAmtPaid"]=train_test_merged.groupby('ClmDiagnosisCode_1')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1Avg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_1')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1Avg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_1')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1Avg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_1')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1Avg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_1')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1Avg_AdmitForDays"]=train_test_merged.groupby('ClmDiagnosisCode_1')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by claim dx code 2
+    train_test_merged["PerClmDiagnosisCode_2Avg_InscClaimAmtReimbursed"]=train_test_merged.groupby('ClmDiagnosisCode_2')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2Avg_DeductibleAmtPaid"]=train_test_merged.groupby('ClmDiagnosisCode_2')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2Avg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_2')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2Avg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_2')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2Avg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_2')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2Avg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_2')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2Avg_AdmitForDays"]=train_test_merged.groupby('ClmDiagnosisCode_2')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature group by claim dx code 3
+    train_test_merged["PerClmDiagnosisCode_3Avg_InscClaimAmtReimbursed"]=train_test_merged.groupby('ClmDiagnosisCode_3')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3Avg_DeductibleAmtPaid"]=train_test_merged.groupby('ClmDiagnosisCode_3')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3Avg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_3')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3Avg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_3')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3Avg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_3')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3Avg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_3')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3Avg_AdmitForDays"]=train_test_merged.groupby('ClmDiagnosisCode_3')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #average feature grouped by Provider+BeneID, Provider+Attending Physician, Provider+ClmAdmitDiagnosisCode, Provider+ClmProcedureCode_1, Provider+ClmDiagnosisCode_1, Provider+State
+    train_test_merged["ClmCount_Provider"]=train_test_merged.groupby(['Provider'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_BeneID"]=train_test_merged.groupby(['Provider','BeneID'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_AttendingPhysician"]=train_test_merged.groupby(['Provider','AttendingPhysician'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_OtherPhysician"]=train_test_merged.groupby(['Provider','OtherPhysician'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_OperatingPhysician"]=train_test_merged.groupby(['Provider','OperatingPhysician'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmAdmitDiagnosisCode"]=train_test_merged.groupby(['Provider','ClmAdmitDiagnosisCode'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmProcedureCode_1"]=train_test_merged.groupby(['Provider','ClmProcedureCode_1'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmProcedureCode_2"]=train_test_merged.groupby(['Provider','ClmProcedureCode_2'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmProcedureCode_3"]=train_test_merged.groupby(['Provider','ClmProcedureCode_3'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmProcedureCode_4"]=train_test_merged.groupby(['Provider','ClmProcedureCode_4'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmProcedureCode_5"]=train_test_merged.groupby(['Provider','ClmProcedureCode_5'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmDiagnosisCode_1"]=train_test_merged.groupby(['Provider','ClmDiagnosisCode_1'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmDiagnosisCode_2"]=train_test_merged.groupby(['Provider','ClmDiagnosisCode_2'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmDiagnosisCode_3"]=train_test_merged.groupby(['Provider','ClmDiagnosisCode_3'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmDiagnosisCode_4"]=train_test_merged.groupby(['Provider','ClmDiagnosisCode_4'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmDiagnosisCode_5"]=train_test_merged.groupby(['Provider','ClmDiagnosisCode_5'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmDiagnosisCode_6"]=train_test_merged.groupby(['Provider','ClmDiagnosisCode_6'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmDiagnosisCode_7"]=train_test_merged.groupby(['Provider','ClmDiagnosisCode_7'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmDiagnosisCode_8"]=train_test_merged.groupby(['Provider','ClmDiagnosisCode_8'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_ClmDiagnosisCode_9"]=train_test_merged.groupby(['Provider','ClmDiagnosisCode_9'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_DiagnosisGroupCode"]=train_test_merged.groupby(['Provider','DiagnosisGroupCode'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_BeneID_AttendingPhysician"]=train_test_merged.groupby(['Provider','BeneID','AttendingPhysician'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_BeneID_OtherPhysician"]=train_test_merged.groupby(['Provider','BeneID','OtherPhysician'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_BeneID_AttendingPhysician_ClmProcedureCode_1"]=train_test_merged.groupby(['Provider','BeneID','AttendingPhysician','ClmProcedureCode_1'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_BeneID_AttendingPhysician_ClmDiagnosisCode_1"]=train_test_merged.groupby(['Provider','BeneID','AttendingPhysician','ClmDiagnosisCode_1'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_BeneID_OperatingPhysician"]=train_test_merged.groupby(['Provider','BeneID','OperatingPhysician'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_BeneID_ClmProcedureCode_1"]=train_test_merged.groupby(['Provider','BeneID','ClmProcedureCode_1'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_BeneID_ClmDiagnosisCode_1"]=train_test_merged.groupby(['Provider','BeneID','ClmDiagnosisCode_1'])['ClaimID'].transform('count')
+    train_test_merged["ClmCount_Provider_BeneID_ClmDiagnosisCode_1_ClmProcedureCode_1"]=train_test_merged.groupby(['Provider','BeneID','ClmDiagnosisCode_1','ClmProcedureCode_1'])['ClaimID'].transform('count')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #here creating dx code grp for ClmDiagnosisCode_1
+    train_test_merged['ClmDiagnosisCode_1_Grp'] = train_test_merged['ClmDiagnosisCode_1'].astype(str).str[0:2]
+    #Average features group by dx code group as per proposed idea in abstract - for ClmDiagnosisCode_1
+    train_test_merged["PerClmDiagnosisCode_1_GrpAvg_InscClaimAmtReimbursed"]=train_test_merged.groupby('ClmDiagnosisCode_1_Grp')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1_GrpAvg_DeductibleAmtPaid"]=train_test_merged.groupby('ClmDiagnosisCode_1_Grp')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1_GrpAvg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_1_Grp')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1_GrpAvg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_1_Grp')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1_GrpAvg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_1')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1_GrpAvg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_1_Grp')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_1_GrpAvg_AdmitForDays"]=train_test_merged.groupby('ClmDiagnosisCode_1_Grp')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #here creating dx code grp for ClmDiagnosisCode_1
+    train_test_merged['ClmDiagnosisCode_2_Grp'] = train_test_merged['ClmDiagnosisCode_2'].astype(str).str[0:2]
+    #Average features group by dx code group as per proposed idea in abstract - for ClmDiagnosisCode_2
+    train_test_merged["PerClmDiagnosisCode_2_GrpAvg_InscClaimAmtReimbursed"]=train_test_merged.groupby('ClmDiagnosisCode_2_Grp')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2_GrpAvg_DeductibleAmtPaid"]=train_test_merged.groupby('ClmDiagnosisCode_2_Grp')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2_GrpAvg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_2_Grp')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2_GrpAvg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_2_Grp')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2_GrpAvg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_2')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2_GrpAvg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_2_Grp')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_2_GrpAvg_AdmitForDays"]=train_test_merged.groupby('ClmDiagnosisCode_2_Grp')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    #here creating dx code grp for ClmDiagnosisCode_3
+    train_test_merged['ClmDiagnosisCode_3_Grp'] = train_test_merged['ClmDiagnosisCode_3'].astype(str).str[0:2]
+    #Average features group by dx code group as per proposed idea in abstract - for ClmDiagnosisCode_3
+    train_test_merged["PerClmDiagnosisCode_3_GrpAvg_InscClaimAmtReimbursed"]=train_test_merged.groupby('ClmDiagnosisCode_3_Grp')['InscClaimAmtReimbursed'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3_GrpAvg_DeductibleAmtPaid"]=train_test_merged.groupby('ClmDiagnosisCode_3_Grp')['DeductibleAmtPaid'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3_GrpAvg_IPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_3_Grp')['IPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3_GrpAvg_IPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_3_Grp')['IPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3_GrpAvg_OPAnnualReimbursementAmt"]=train_test_merged.groupby('ClmDiagnosisCode_3')['OPAnnualReimbursementAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3_GrpAvg_OPAnnualDeductibleAmt"]=train_test_merged.groupby('ClmDiagnosisCode_3_Grp')['OPAnnualDeductibleAmt'].transform('mean')
+    train_test_merged["PerClmDiagnosisCode_3_GrpAvg_AdmitForDays"]=train_test_merged.groupby('ClmDiagnosisCode_3_Grp')['AdmitForDays'].transform('mean')
+    #defragmenting df
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    train_test_merged.drop(columns=temp_cols_list, axis=1, inplace=True)
+    
+    
+    # for calculating tf_idf on claim dx codes
+    dx_col_list = ['ClmDiagnosisCode_1', 'ClmDiagnosisCode_2', 'ClmDiagnosisCode_3', 'ClmDiagnosisCode_4']
+    temp_data = tf_idf_on_dx_cpt(train_test_merged[['ClaimID', 'Provider']+dx_col_list], dx_col_list)
+    #defragmenting df
+    test_data_all = test_data_all.merge(temp_data, on=['ClaimID', 'Provider'])
+    
+    
+    # for calculating tf_idf on claim cpt codes
+    cpt_col_list = ['ClmProcedureCode_1', 'ClmProcedureCode_2', 'ClmProcedureCode_3']
+    temp_data = tf_idf_on_dx_cpt(train_test_merged[['ClaimID', 'Provider']+cpt_col_list], cpt_col_list)
+    #defragmenting df
+    test_data_all = test_data_all.merge(temp_data, on=['ClaimID', 'Provider'])
+    del temp_data
+    
+
+    ## Lets Convert types of gender and race to categorical.
+    train_test_merged.Gender=train_test_merged.Gender.astype('category')
+    train_test_merged.Race=train_test_merged.Race.astype('category')
+
+    # Lets create dummies for categorrical columns.
+    train_test_merged=pd.get_dummies(train_test_merged,columns=['Gender','Race'],drop_first=True)
+    test_data = test_data.loc[:, ~test_data.columns.isin(['Gender','Race'])]
+    temp_cols_list = sorted(set(train_test_merged.columns)-set(test_data.columns), key=list(train_test_merged.columns).index)
+    test_data_all = test_data_all.merge(train_test_merged[['ClaimID']+temp_cols_list], on='ClaimID')
+    del train_test_merged
+    
+    ##### Lets impute numeric columns with 0
+    cols1 = test_data_all.select_dtypes([np.number]).columns
+    test_data_all[cols1]=test_data_all[cols1].fillna(value=0)
+    
+    # Lets remove unnecessary columns ,as we grouped based on these columns and derived maximum infromation from them.
+    remove_these_columns=['BeneID', 'ClaimID', 'ClaimStartDt','ClaimEndDt','AttendingPhysician',
+           'OperatingPhysician', 'OtherPhysician', 'ClmDiagnosisCode_1',
+           'ClmDiagnosisCode_2', 'ClmDiagnosisCode_3', 'ClmDiagnosisCode_4',
+           'ClmDiagnosisCode_5', 'ClmDiagnosisCode_6', 'ClmDiagnosisCode_7',
+           'ClmDiagnosisCode_8', 'ClmDiagnosisCode_9', 'ClmDiagnosisCode_10',
+           'ClmProcedureCode_1', 'ClmProcedureCode_2', 'ClmProcedureCode_3',
+           'ClmProcedureCode_4', 'ClmProcedureCode_5', 'ClmProcedureCode_6',
+           'ClmAdmitDiagnosisCode', 'AdmissionDt',
+           'DischargeDt', 'DiagnosisGroupCode','DOB', 'DOD',
+            'State', 'County', 'ClmDiagnosisCode_1_Grp', 'ClmDiagnosisCode_2_Grp', 'ClmDiagnosisCode_3_Grp', 'Gender','Race']
+
+    test_data_all = test_data_all.drop(axis=1, columns=remove_these_columns)
+
+    ## Lets apply StandardScaler and transform values to its z form,where 99.7% values range between -3 to 3.
+    sc = get_scaler()   # loaded once per process
+    X_test=sc.transform(test_data_all.iloc[:,1:])   #Apply Standard Scaler to unseen data
+    return X_test
+
+def tf_idf_on_dx_cpt(dataframe, dx_or_cpt_col_list):
+    '''this function calculates tf, idf and tf_idf features on dx codes or cpt codes as per proposed idea of abstract document'''
+    N = dataframe.groupby('Provider')['Provider'].count().shape[0] #no of unique provider = no of document corpus
+    
+    for each_col in dx_or_cpt_col_list:
+        term_freq = dataframe.groupby(['Provider', each_col])[['ClaimID']].count().reset_index()
+        term_freq.rename(columns={'ClaimID': each_col+'_term'}, inplace=True)
+        dataframe = dataframe.merge(term_freq, on=['Provider', each_col], how='outer')
+        no_of_dx_in_each_prov = dataframe.groupby('Provider')[each_col].count().reset_index()
+        no_of_dx_in_each_prov.rename(columns={each_col:each_col+'_doc'}, inplace=True)
+        dataframe = dataframe.merge(no_of_dx_in_each_prov, on=['Provider'], how='outer')
+        dataframe[each_col+'TF'] = dataframe[each_col+'_term']/dataframe[each_col+'_doc']
+
+        no_of_doc_containing_dx = dataframe.groupby(each_col)[['Provider']].count().reset_index()
+        no_of_doc_containing_dx.rename(columns={'Provider':each_col+'_IDF'}, inplace=True)
+        no_of_doc_containing_dx[each_col+'_IDF'] = np.log2(N/no_of_doc_containing_dx[each_col+'_IDF'])
+        dataframe = dataframe.merge(no_of_doc_containing_dx, on=each_col, how='outer')
+        dataframe[each_col+'TF-IDF'] = dataframe[each_col+'TF']*dataframe[each_col+'_IDF']
+        dataframe.drop([each_col, each_col+'_term', each_col+'_doc'], axis=1, inplace=True)
+
+    return dataframe
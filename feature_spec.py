@@ -0,0 +1,89 @@
+'''declarative description of the features generated by feature_engg in fraud_pred_app.py
+every aggregate feature is described as (feature name, operation, grouping key columns, value column)
+and FEATURE_COLUMNS keeps the exact sequence in which Std Scaler and XGB model were trained'''
+
+# raw columns of merged data which are passed as it is to the model
+BASE_COLS = ['InscClaimAmtReimbursed', 'DeductibleAmtPaid', 'AdmitForDays', 'RenalDiseaseIndicator',
+             'NoOfMonths_PartACov', 'NoOfMonths_PartBCov', 'ChronicCond_Alzheimer', 'ChronicCond_Heartfailure',
+             'ChronicCond_KidneyDisease', 'ChronicCond_Cancer', 'ChronicCond_ObstrPulmonary', 'ChronicCond_Depression',
+             'ChronicCond_Diabetes', 'ChronicCond_IschemicHeart', 'ChronicCond_Osteoporasis',
+             'ChronicCond_rheumatoidarthritis', 'ChronicCond_stroke', 'IPAnnualReimbursementAmt', 'IPAnnualDeductibleAmt',
+             'OPAnnualReimbursementAmt', 'OPAnnualDeductibleAmt', 'Age', 'WhetherDead']
+
+AVG_VALUE_COLS = ['InscClaimAmtReimbursed', 'DeductibleAmtPaid', 'IPAnnualReimbursementAmt', 'IPAnnualDeductibleAmt',
+                  'OPAnnualReimbursementAmt', 'OPAnnualDeductibleAmt', 'AdmitForDays']
+
+# dx code group columns are derived from first two characters of dx code
+GRP_KEY_COLS = {'ClmDiagnosisCode_1_Grp': 'ClmDiagnosisCode_1',
+                'ClmDiagnosisCode_2_Grp': 'ClmDiagnosisCode_2',
+                'ClmDiagnosisCode_3_Grp': 'ClmDiagnosisCode_3'}
+
+DX_TF_IDF_COLS = ['ClmDiagnosisCode_1', 'ClmDiagnosisCode_2', 'ClmDiagnosisCode_3', 'ClmDiagnosisCode_4']
+CPT_TF_IDF_COLS = ['ClmProcedureCode_1', 'ClmProcedureCode_2', 'ClmProcedureCode_3']
+TF_IDF_COLS = DX_TF_IDF_COLS + CPT_TF_IDF_COLS
+
+# dummies of Gender and Race with first category dropped, as (dummy column, source column, category)
+DUMMY_COLS = [('Gender_2', 'Gender', '2'), ('Race_2', 'Race', '2'), ('Race_3', 'Race', '3'), ('Race_5', 'Race', '5')]
+
+COUNT_KEYS = [('Provider',), ('Provider', 'BeneID'), ('Provider', 'AttendingPhysician'), ('Provider', 'OtherPhysician'),
+              ('Provider', 'OperatingPhysician'), ('Provider', 'ClmAdmitDiagnosisCode'),
+              ('Provider', 'ClmProcedureCode_1'), ('Provider', 'ClmProcedureCode_2'), ('Provider', 'ClmProcedureCode_3'),
+              ('Provider', 'ClmProcedureCode_4'), ('Provider', 'ClmProcedureCode_5'),
+              ('Provider', 'ClmDiagnosisCode_1'), ('Provider', 'ClmDiagnosisCode_2'), ('Provider', 'ClmDiagnosisCode_3'),
+              ('Provider', 'ClmDiagnosisCode_4'), ('Provider', 'ClmDiagnosisCode_5'), ('Provider', 'ClmDiagnosisCode_6'),
+              ('Provider', 'ClmDiagnosisCode_7'), ('Provider', 'ClmDiagnosisCode_8'), ('Provider', 'ClmDiagnosisCode_9'),
+              ('Provider', 'DiagnosisGroupCode'), ('Provider', 'BeneID', 'AttendingPhysician'),
+              ('Provider', 'BeneID', 'OtherPhysician'),
+              ('Provider', 'BeneID', 'AttendingPhysician', 'ClmProcedureCode_1'),
+              ('Provider', 'BeneID', 'AttendingPhysician', 'ClmDiagnosisCode_1'),
+              ('Provider', 'BeneID', 'OperatingPhysician'), ('Provider', 'BeneID', 'ClmProcedureCode_1'),
+              ('Provider', 'BeneID', 'ClmDiagnosisCode_1'),
+              ('Provider', 'BeneID', 'ClmDiagnosisCode_1', 'ClmProcedureCode_1')]
+
+
+def _avg_block(key, value_cols):
+    return [('Per'+key+'Avg_'+value, 'mean', (key,), value) for value in value_cols]
+
+def _grp_avg_block(grp_key):
+    #same as feature_engg, OPAnnualReimbursementAmt average of dx code group is grouped by dx code itself
+    return [('Per'+grp_key+'Avg_'+value, 'mean', (GRP_KEY_COLS[grp_key] if value == 'OPAnnualReimbursementAmt' else grp_key,), value)
+            for value in AVG_VALUE_COLS]
+
+
+# aggregate features in the same order as generated in feature_engg, blocks are in the order of its sections
+AGG_FEATURE_BLOCKS = [
+    ('PerProviderAvg', _avg_block('Provider', ['InscClaimAmtReimbursed', 'DeductibleAmtPaid', 'IPAnnualReimbursementAmt',
+                                               'IPAnnualDeductibleAmt', 'OPAnnualReimbursementAmt', 'OPAnnualDeductibleAmt',
+                                               'Age', 'NoOfMonths_PartACov', 'NoOfMonths_PartBCov', 'AdmitForDays'])),
+    ('PerBeneIDAvg', _avg_block('BeneID', ['InscClaimAmtReimbursed', 'DeductibleAmtPaid', 'IPAnnualReimbursementAmt',
+                                           'AdmitForDays'])),
+    ('PerAttendingPhysicianAvg', _avg_block('AttendingPhysician', AVG_VALUE_COLS)),
+    ('PerOperatingPhysicianAvg', _avg_block('OperatingPhysician', AVG_VALUE_COLS)),
+    ('PerDiagnosisGroupCodeAvg', _avg_block('DiagnosisGroupCode', AVG_VALUE_COLS)),
+    ('PerClmAdmitDiagnosisCodeAvg', _avg_block('ClmAdmitDiagnosisCode', AVG_VALUE_COLS)),
+    ('PerClmProcedureCode_1Avg', _avg_block('ClmProcedureCode_1', AVG_VALUE_COLS)),
+    ('PerClmProcedureCode_2Avg', _avg_block('ClmProcedureCode_2', AVG_VALUE_COLS)),
+    ('PerClmDiagnosisCode_1Avg', _avg_block('ClmDiagnosisCode_1', AVG_VALUE_COLS)),
+    ('PerClmDiagnosisCode_2Avg', _avg_block('ClmDiagnosisCode_2', AVG_VALUE_COLS)),
+    ('PerClmDiagnosisCode_3Avg', _avg_block('ClmDiagnosisCode_3', AVG_VALUE_COLS)),
+    ('ClmCount', [('ClmCount_'+'_'.join(keys), 'count', keys, 'ClaimID') for keys in COUNT_KEYS]),
+    ('PerClmDiagnosisCode_1_GrpAvg', _grp_avg_block('ClmDiagnosisCode_1_Grp')),
+    ('PerClmDiagnosisCode_2_GrpAvg', _grp_avg_block('ClmDiagnosisCode_2_Grp')),
+    ('PerClmDiagnosisCode_3_GrpAvg', _grp_avg_block('ClmDiagnosisCode_3_Grp')),
+]
+AGG_FEATURES = [feature for _, block in AGG_FEATURE_BLOCKS for feature in block]
+
+def _by_keys(features):
+    spec = {}
+    for name, op, keys, value in features:
+        spec.setdefault(keys, []).append((name, op, value))
+    return spec
+
+# aggregate features grouped by their key columns, keys -> list of (feature name, operation, value column)
+# every key set is grouped (hashed) only once and all of its features are computed together
+AGG_SPEC = _by_keys(AGG_FEATURES)
+
+TF_IDF_FEATURES = [col+suffix for col in TF_IDF_COLS for suffix in ('TF', '_IDF', 'TF-IDF')]
+
+#maintaining sequence is mandetaory as Std Scaler preprocess in the same sequence as it was trained
+FEATURE_COLUMNS = BASE_COLS + [feature[0] for feature in AGG_FEATURES] + TF_IDF_FEATURES + [dummy[0] for dummy in DUMMY_COLS]
@@ -0,0 +1,124 @@
+'''shared dictionary encoding of id and code columns
+
+Every groupby of feature engineering is keyed on id/code columns (Provider, BeneID, physicians, dx and procedure codes)
+which are strings (object columns). IdVocabulary maps values of each such column to dense int32 codes, code of a value is
+its position in the column's vocabulary, nan is -1. The same vocabulary is kept with the reference stats, so codes of a
+batch are comparable with codes of reference tables and grouping, joining and dedup of claims run on int arrays.
+
+Values not in vocabulary get codes after the last code of vocabulary (in order of first appearance), when encoding with
+grow=True these values are added to vocabulary with the same codes, otherwise vocabulary is not changed.
+Added values are kept as levels (see push_level), so growing a large vocabulary does not copy and rehash it on every
+batch, levels are merged into one index when values are read.'''
+import numpy as np
+import pandas as pd
+
+from feature_spec import GRP_KEY_COLS
+
+
+ID_COLS = ['ClaimID', 'Provider', 'BeneID', 'AttendingPhysician', 'OperatingPhysician', 'OtherPhysician',
+           'ClmAdmitDiagnosisCode', 'DiagnosisGroupCode'] + \
+          ['ClmDiagnosisCode_'+str(i) for i in range(1, 11)] + ['ClmProcedureCode_'+str(i) for i in range(1, 7)] + \
+          list(GRP_KEY_COLS)
+
+
+def push_level(levels, level, concat):
+    '''appends level to levels (parts of a growing table, largest first) and merges the last two levels while the one
+    before is not twice as large as the last, so there are O(log n) levels and every row is copied O(log n) times
+    however many small parts are appended'''
+    levels.append(level)
+    while len(levels) > 1 and len(levels[-2]) < 2*len(levels[-1]):
+        last = levels.pop()
+        levels[-1] = concat([levels[-1], last])
+
+def _append_index(parts):
+    return parts[0].append(parts[1:])
+
+
+class IdVocabulary:
+    '''per column vocabulary of values, position of value in vocabulary is its int32 code'''
+
+    def __init__(self, values=None):
+        self._levels = dict((col, [index]) for col, index in (values or {}).items())
+
+    @property
+    def values(self):
+        '''dict of column -> index of its values in sequence of codes'''
+        for col, levels in self._levels.items():
+            if len(levels) > 1:
+                self._levels[col] = [_append_index(levels)]
+        return dict((col, levels[0]) for col, levels in self._levels.items())
+
+    def __getstate__(self):
+        return {'values': self.values}
+
+    def __setstate__(self, state):
+        self.__init__(state['values'])
+
+    def __len__(self):
+        return sum(self.size(col) for col in self._levels)
+
+    def size(self, col):
+        '''no of values of the column in vocabulary, codes at or above it are of values not in vocabulary'''
+        return sum(len(level) for level in self._levels.get(col, ()))
+
+    def encode(self, series, col, grow=False):
+        '''returns int32 codes of values of series, -1 for nan'''
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            #categorical (from prepared cache) is already encoded, only its categories are looked up
+            uniques, inverse = series.cat.categories, series.cat.codes.values
+        else:
+            inverse, uniques = pd.factorize(series.values)
+        codes = self._unique_codes(uniques, col, grow)
+        return np.where(inverse >= 0, codes[inverse] if len(codes) else -1, -1).astype(np.int32)
+
+    def encode_grp(self, series, col, grow=False):
+        '''returns int32 codes of dx code group (first two characters of code, nan becomes 'na' as in feature_engg)
+        of values of series, the group is derived only once per distinct code'''
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            uniques, inverse = series.cat.categories, series.cat.codes.values
+        else:
+            inverse, uniques = pd.factorize(series.values)
+        #nan dx code is mapped to the extra last position
+        groups = pd.Index(uniques, dtype=object).append(pd.Index([np.nan], dtype=object)).astype(str).str[0:2]
+        group_inverse, groups = pd.factorize(groups)
+        codes = self._unique_codes(groups, col, grow)[group_inverse]
+        inverse = np.where(inverse >= 0, inverse, len(uniques))
+        return codes[inverse].astype(np.int32)
+
+    def _unique_codes(self, uniques, col, grow):
+        #codes of distinct values, values not in vocabulary are numbered after it
+        levels = self._levels.get(col, [])
+        uniques = pd.Index(uniques, dtype=object)
+        codes = np.full(len(uniques), -1, dtype=np.intp)
+        offset = 0
+        for level in levels:
+            pos = level.get_indexer(uniques)
+            codes[pos >= 0] = offset+pos[pos >= 0]
+            offset += len(level)
+        unknown = codes < 0
+        if unknown.any():
+            codes[unknown] = offset+np.arange(unknown.sum())
+        if grow:
+            levels = self._levels.setdefault(col, [pd.Index([], dtype=object)])
+            if unknown.any():
+                push_level(levels, uniques[unknown], _append_index)
+        return codes
+
+    def decode(self, codes, col):
+        '''returns values of int codes, nan for -1 and codes not in vocabulary'''
+        vocab = self.values.get(col, pd.Index([], dtype=object))
+        codes = np.asarray(codes)
+        valid = (codes >= 0) & (codes < len(vocab))
+        values = np.full(len(codes), np.nan, dtype=object)
+        values[valid] = vocab.values[codes[valid]]
+        return values
+
+    def merge(self, other):
+        '''returns vocabulary having values of both vocabularies (codes of this vocabulary are kept as they are)
+        and dict of column -> array which maps codes of other vocabulary to codes of merged vocabulary'''
+        merged = IdVocabulary()
+        merged._levels = dict((col, list(levels)) for col, levels in self._levels.items())
+        remap = {}
+        for col, values in other.values.items():
+            remap[col] = merged._unique_codes(values, col, grow=True)
+        return merged, remap
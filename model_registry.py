@@ -0,0 +1,170 @@
+'''process wide registry of XGB model and Std Scaler
+
+model and scaler are loaded once per process and shared by all streamlit sessions and reruns (and batch scoring).
+On every access only the file's modification time and size are checked, if they have changed then its checksum
+is computed and model/scaler is reloaded only if checksum is different, so a new model file is picked up without restart.
+Load time and memory taken by each load are recorded and can be seen with registry.info()
+Model is also compiled into numpy arrays (see compiled_model.py) for scoring small batches without xgboost overhead.
+If model fused with scaler has been exported (python compiled_model.py fuse) from the current model and scaler files,
+it is used for scoring unscaled features directly.'''
+import hashlib
+import os
+import threading
+import time
+from joblib import load
+from xgboost import XGBClassifier
+
+from compiled_model import FUSED_MODEL_PATH, CompiledModel
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+MODEL_PATH = 'XGB_Model.json'
+SCALER_PATH = 'std_scaler.bin'
+
+
+def file_checksum(path):
+    '''sha256 of file content'''
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def rss_bytes():
+    '''resident memory of current process, None if it can not be known on this platform'''
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def load_xgb_model(path):
+    xgb_clf = XGBClassifier(booster='gbtree')
+    xgb_clf.load_model(path)
+    return xgb_clf
+
+
+class _Entry:
+    '''one loaded artifact with details of its file and load'''
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+        self.obj = None
+        self.stat = None
+        self.checksum = None
+        self.load_seconds = None
+        self.load_memory_bytes = None
+        self.loaded_at = None
+        self.load_count = 0
+        self._version_stat = None
+        self._version = None
+
+    def get(self):
+        stat = os.stat(self.path)
+        stat = (stat.st_mtime_ns, stat.st_size)
+        if stat != self.stat:
+            checksum = file_checksum(self.path)
+            if checksum != self.checksum:
+                self._load(checksum)
+            self.stat = stat
+        return self.obj
+
+    def file_version(self):
+        '''checksum of current file content without loading it, None if file does not exist'''
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        stat = (stat.st_mtime_ns, stat.st_size)
+        if stat != self._version_stat:
+            self._version = file_checksum(self.path)
+            self._version_stat = stat
+        return self._version
+
+    def _load(self, checksum):
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        obj = self.loader(self.path)
+        self.load_seconds = time.perf_counter()-start
+        rss_after = rss_bytes()
+        self.load_memory_bytes = None if rss_before is None or rss_after is None else rss_after-rss_before
+        self.obj, self.checksum = obj, checksum
+        self.loaded_at = time.time()
+        self.load_count += 1
+
+    def info(self):
+        return {'path': self.path, 'checksum': self.checksum, 'load_seconds': self.load_seconds,
+                'load_memory_bytes': self.load_memory_bytes, 'loaded_at': self.loaded_at, 'load_count': self.load_count}
+
+
+class ModelRegistry:
+    '''loads model and scaler once and hot swaps them when their file content changes'''
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, fused_model_path=FUSED_MODEL_PATH):
+        self._lock = threading.Lock()
+        self._model = _Entry(model_path, load_xgb_model)
+        self._compiled_model = _Entry(model_path, CompiledModel.from_json)
+        self._scaler = _Entry(scaler_path, load)
+        self._fused_model = _Entry(fused_model_path, CompiledModel.load)
+
+    def get_model(self):
+        with self._lock:
+            return self._model.get()
+
+    def get_compiled_model(self):
+        with self._lock:
+            return self._compiled_model.get()
+
+    def get_scaler(self):
+        with self._lock:
+            return self._scaler.get()
+
+    def get_fused_model(self):
+        '''returns exported model fused with scaler, None if it is not exported or is made from other model or scaler files'''
+        with self._lock:
+            if not os.path.exists(self._fused_model.path):
+                return None
+            fused = self._fused_model.get()
+            self._compiled_model.get()
+            self._scaler.get()
+            if fused.source != {'model': self._compiled_model.checksum, 'scaler': self._scaler.checksum}:
+                return None
+            return fused
+
+    def version(self):
+        '''checksums of current model, scaler and fused model files, predictions of same version are same'''
+        with self._lock:
+            return (self._model.file_version(), self._scaler.file_version(), self._fused_model.file_version())
+
+    def info(self):
+        with self._lock:
+            return {'model': self._model.info(), 'compiled_model': self._compiled_model.info(), 'scaler': self._scaler.info(),
+                    'fused_model': self._fused_model.info()}
+
+
+registry = ModelRegistry()
+
+def get_model():
+    '''returns shared XGB model of this process'''
+    return registry.get_model()
+
+def get_compiled_model():
+    '''returns shared compiled XGB model of this process'''
+    return registry.get_compiled_model()
+
+def get_fused_model():
+    '''returns shared model fused with scaler of this process, None if it is not available'''
+    return registry.get_fused_model()
+
+def get_scaler():
+    '''returns shared Std Scaler of this process'''
+    return registry.get_scaler()
+
+def model_version():
+    '''checksums of current model, scaler and fused model files'''
+    return registry.version()
@@ -0,0 +1,156 @@
+'''parity check of feature engines against the original feature_engg (feature_engineering.py)
+
+Original feature_engg and an alternative implementation featurize the same batch of prepared claims with the same
+train data. Both feature matrices are compared column by column in scaled form (the form XGB model sees), every
+value must be within rtol/atol of the original (np.isclose, nan equal to nan). Column sequence of the alternative is
+checked against the sequence Std Scaler was trained on. Both matrices are then predicted by XGB model and claims
+whose predicted label differs (prediction flips) are reported; --model scores the alternative with the compiled or
+fused model (compiled_model.py) instead of XGB model.
+
+alternatives (ALTERNATIVES)
+  engine           single pass feature engine (feature_engine.py), train data aggregated for the call
+  engine_parallel  same with feature blocks computed by 4 threads, for batches of any size (PARALLEL_MIN_ROWS is
+                   not applied, so threads are checked with --rows 1000 too)
+  reference_stats  feature engine on precomputed reference stats (--stats), fitted on the same train data
+  sql              SQL backend (sql_features.py, needs duckdb) on the same train data
+  partitioned      feature engine in 2 worker processes on provider partitions of the batch (partitioned_scoring.py)
+  engine_pruned    feature engine computing only the features read by splits of the model (FeaturePlan), only
+                   these columns are compared, other columns are placeholders
+
+Exit code is 1 if any column differs or any prediction flips, so it can gate changes to the feature engine.
+
+usage: python -m parity [--alternative engine] [--model xgb] [--rows 1000] [--sample] [--rtol 1e-9] [--atol 1e-9]
+                        [--output parity_report.json]'''
+import argparse
+import json
+import sys
+import numpy as np
+import pandas as pd
+
+from data_prep import TEST_FILES, get_train_data
+from feature_engine import plan_for_model
+from feature_engineering import feature_engg
+from model_registry import get_compiled_model, get_fused_model, get_model, get_scaler
+from partitioned_scoring import feature_engg_partitioned
+from prepared_cache import load_or_prepare
+from reference_stats import REFERENCE_STATS_PATH, load_reference_stats
+from scoring import featurize
+from sql_features import feature_engg_sql
+
+
+ALTERNATIVES = {
+    'engine': lambda test_data, train_data, stats_path: featurize(test_data, train_data=train_data, scale=False),
+    'engine_parallel': lambda test_data, train_data, stats_path: featurize(test_data, train_data=train_data, workers=4,
+                                                                           scale=False, min_rows=0),
+    'reference_stats': lambda test_data, train_data, stats_path: featurize(test_data, load_reference_stats(stats_path),
+                                                                           scale=False),
+    'sql': lambda test_data, train_data, stats_path: feature_engg_sql(test_data, train_data),
+    'partitioned': lambda test_data, train_data, stats_path: feature_engg_partitioned(test_data, train_data),
+    'engine_pruned': lambda test_data, train_data, stats_path: featurize(test_data, train_data=train_data, scale=False,
+                                                                         plan=plan_for_model(get_compiled_model())),
+}
+#alternatives computing a subset of features, positions of the compared features
+COMPARED_FEATURES = {'engine_pruned': lambda: plan_for_model(get_compiled_model()).computed}
+MODELS = ('xgb', 'compiled', 'fused')
+
+
+def compare_features(expected, actual, columns, rtol=1e-9, atol=1e-9, claim_ids=None):
+    '''compares 2d arrays column by column, returns list of dicts of columns having values out of tolerance'''
+    close = np.isclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True)
+    mismatches = []
+    for i in np.flatnonzero(~close.all(axis=0)):
+        rows = np.flatnonzero(~close[:, i])
+        with np.errstate(invalid='ignore'):
+            diff = np.abs(actual[rows, i]-expected[rows, i])
+        first = rows[0]
+        mismatches.append({'column': columns[i], 'position': int(i), 'rows': len(rows),
+                           'max_abs_diff': float(np.nanmax(diff)) if not np.isnan(diff).all() else None,
+                           'first_row': int(first), 'first_claim': None if claim_ids is None else str(claim_ids[first]),
+                           'expected': float(expected[first, i]), 'actual': float(actual[first, i])})
+    return mismatches
+
+def prediction_flips(expected_proba, actual_proba, claim_ids, limit=20):
+    '''claims whose label (probability > 0.5) differs, with max difference of probabilities'''
+    flipped = np.flatnonzero((expected_proba > 0.5) != (actual_proba > 0.5))
+    return {'flips': len(flipped), 'max_proba_diff': float(np.max(np.abs(expected_proba-actual_proba))) if len(claim_ids) else 0.0,
+            'flipped_claims': [{'ClaimID': str(claim_ids[i]), 'expected': float(expected_proba[i]),
+                                'actual': float(actual_proba[i])} for i in flipped[:limit]]}
+
+def _alternative_proba(features, scaled, model):
+    if model == 'xgb':
+        return get_model().predict_proba(scaled)[:, 1]
+    if model == 'compiled':
+        return get_compiled_model().predict_proba(scaled)[:, 1]
+    fused_model = get_fused_model()
+    if fused_model is None:
+        raise ValueError('fused model is not available, run "python compiled_model.py fuse" first')
+    return fused_model.predict_proba(features)[:, 1]
+
+def run_parity(test_data, train_data, alternative='engine', model='xgb', rtol=1e-9, atol=1e-9,
+               stats_path=REFERENCE_STATS_PATH):
+    '''featurizes test_data by feature_engg and the alternative, returns report dict of column mismatches and flips'''
+    scaler = get_scaler()
+    claim_ids = test_data['ClaimID'].values
+    expected = np.asarray(feature_engg(test_data, train_data), dtype=np.float64)
+
+    features = ALTERNATIVES[alternative](test_data, train_data, stats_path)
+    report = {'alternative': alternative, 'model': model, 'claims': len(test_data), 'rtol': rtol, 'atol': atol}
+    report['column_order'] = list(features.columns) == list(getattr(scaler, 'feature_names_in_', features.columns))
+    if not report['column_order'] or expected.shape != features.shape:
+        report['error'] = 'shape %s or columns of alternative do not match original %s' % (features.shape, expected.shape)
+        return report
+    scaled = scaler.transform(features)
+    compared = COMPARED_FEATURES[alternative]() if alternative in COMPARED_FEATURES else np.arange(features.shape[1])
+    report['compared_columns'] = len(compared)
+    report['mismatching_columns'] = compare_features(expected[:, compared], scaled[:, compared],
+                                                     list(features.columns[compared]), rtol, atol, claim_ids)
+    for mismatch in report['mismatching_columns']:
+        mismatch['position'] = int(compared[mismatch['position']])
+
+    #labels of original features by XGB model, as predicted by the app before
+    expected_proba = get_model().predict_proba(expected)[:, 1]
+    report['predictions'] = prediction_flips(expected_proba, _alternative_proba(features, scaled, model), claim_ids)
+    return report
+
+def passed(report):
+    return 'error' not in report and not report['mismatching_columns'] and report['predictions']['flips'] == 0
+
+def main():
+    parser = argparse.ArgumentParser(description='compare features and predictions of a feature engine with original feature_engg')
+    parser.add_argument('--alternative', choices=sorted(ALTERNATIVES), default='engine')
+    parser.add_argument('--model', choices=MODELS, default='xgb', help='model predicting features of the alternative')
+    parser.add_argument('--rows', type=int, help='no of claims of test files to check, default is all')
+    parser.add_argument('--sample', action='store_true', help='take random --rows claims instead of first ones')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rtol', type=float, default=1e-9)
+    parser.add_argument('--atol', type=float, default=1e-9)
+    parser.add_argument('--stats', default=REFERENCE_STATS_PATH, help='reference stats for reference_stats alternative')
+    parser.add_argument('--output', help='json file for the report')
+    args = parser.parse_args()
+
+    test_data = load_or_prepare(TEST_FILES)
+    if args.rows is not None:
+        test_data = test_data.sample(args.rows, random_state=args.seed) if args.sample else test_data.head(args.rows)
+    #rows of the report are positions of claims in the batch
+    test_data = test_data.reset_index(drop=True)
+    report = run_parity(test_data, get_train_data(), args.alternative, args.model, args.rtol, args.atol, args.stats)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if 'error' in report:
+        print(report['error'])
+        sys.exit(1)
+    print(report['claims'], 'claims,', len(report['mismatching_columns']), 'mismatching columns,',
+          report['predictions']['flips'], 'prediction flips, max probability difference',
+          report['predictions']['max_proba_diff'])
+    if report['mismatching_columns']:
+        print(pd.DataFrame(report['mismatching_columns']).to_string(index=False))
+    for claim in report['predictions']['flipped_claims']:
+        print('flip', claim['ClaimID'], claim['expected'], '->', claim['actual'])
+    if not passed(report):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
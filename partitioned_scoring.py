@@ -0,0 +1,294 @@
+'''provider partitioned scoring of claims by worker processes (local or on other hosts) with mergeable partial aggregates
+
+Claims are hash partitioned on Provider, so all claims of a provider are in one partition. Aggregate state of
+claims (reference_stats.AggregateState) is split in two by its key sets:
+ - local:  key sets of Provider with other keys (ClmCount_Provider_*, tf-idf terms per provider and code), rows of
+           a provider come only from its own partition, so they are aggregated and looked up by its worker only
+ - shared: key sets crossing providers (BeneID, physicians, codes, dx code groups, claims per code of idf) and
+           ('Provider',) (its rows are small and give no of providers and codes per provider of idf)
+Scoring a batch runs in two rounds:
+  1. every worker aggregates claims of its partition which are counted in the batch (not in reference stats, first
+     claim of a ClaimID in the whole batch) and sends back only the shared part of this partial state
+  2. coordinator merges shared parts (AggregateState.merge) and sends the merged one to all workers, every worker
+     adds it and its own local part to reference stats and featurizes and predicts its partition
+so features and predictions are same as predict_fraud of the whole batch, and only the shared aggregates (and
+claims and predictions) go between processes. As in predict_fraud, only key sets read by features of the model
+(FeaturePlan) are aggregated and only columns of claims they read are sent to workers.
+Workers run in processes started by PartitionedScorer, or on other hosts connecting to the coordinator
+(--listen); remote workers must have the same reference stats and model files, checked on the fingerprint of stats.
+
+usage for coordinator:   python -m partitioned_scoring score beneficiary.csv inpatient.csv outpatient.csv
+                         -o predictions.csv [--partitions 4] [--listen HOST:PORT]
+usage for remote worker: python -m partitioned_scoring worker HOST:PORT [--stats reference_stats.bin]
+PARTITION_AUTHKEY env variable is the secret of connections between coordinator and remote workers, it has no default
+and --listen and worker refuse to start without it. Messages of these connections are pickles, and unpickling runs
+code, so anyone having the key (or reaching a connection of a local worker) can run code in coordinator and workers:
+keep the key secret and listen only on networks of trusted hosts.'''
+import argparse
+import multiprocessing
+import os
+import time
+import traceback
+from functools import reduce
+from multiprocessing.connection import Client, Listener
+import numpy as np
+import pandas as pd
+
+from data_prep import get_train_data, preparing_data, read_raw_data
+from feature_engine import FULL_PLAN
+from feature_spec import GRP_KEY_COLS
+from id_encoding import IdVocabulary
+from profiling import Profiler, profile, record, stage
+from reference_stats import (REFERENCE_STATS_PATH, AggregateState, aggregate, encode_claims, load_reference_stats_if_fitted,
+                             stat_plan)
+from scoring import featurize, predict_fraud, scoring_plan
+
+
+OUTPUT_COLS = ['ClaimID', 'Provider', 'BeneID']
+#secret of connections with remote workers, there is no default as messages are unpickled (see above)
+AUTHKEY = os.environ['PARTITION_AUTHKEY'].encode() if os.environ.get('PARTITION_AUTHKEY') else None
+
+
+def is_local(keys):
+    '''whether rows of key set come only from claims of one provider'''
+    return keys[0] == 'Provider' and len(keys) > 1
+
+def partition_of(providers, partitions):
+    '''partition of every claim, hash of its provider modulo no of partitions'''
+    return (pd.util.hash_array(np.asarray(providers, dtype=object)) % np.uint64(partitions)).astype(np.int64)
+
+def _aggregated_cols(plan):
+    #keys and value columns of key sets read by plan, ClaimID is kept in vocabulary of aggregated claims
+    stat_cols = stat_plan()
+    cols = set(['ClaimID'])
+    for keys in plan.stat_keys:
+        cols.update(keys, *stat_cols[keys])
+    return cols
+
+def partial_stats(claims, counted, plan=FULL_PLAN):
+    '''aggregate state of counted claims of a partition on key sets read by plan (FeaturePlan), returned as
+    (local, shared) states, shared state has only vocabulary of the columns of its key sets (ClaimIDs stay with local)'''
+    stat_cols = stat_plan()
+    vocab = IdVocabulary()
+    tables = {}
+    if counted.any():
+        encoded = encode_claims(claims[counted], vocab, grow=True, cols=_aggregated_cols(plan))
+        tables = dict((keys, aggregate(encoded, keys, *stat_cols[keys])) for keys in plan.stat_keys)
+    shared_keys = [keys for keys in tables if not is_local(keys)]
+    shared_cols = set(col for keys in shared_keys for col in keys)
+    local = AggregateState(dict((keys, table) for keys, table in tables.items() if is_local(keys)), vocab)
+    shared = AggregateState(dict((keys, tables[keys]) for keys in shared_keys),
+                            IdVocabulary(dict((col, values) for col, values in vocab.values.items() if col in shared_cols)))
+    return local, shared
+
+def plan_cols(plan):
+    '''columns of prepared claims read by features of plan, only these are sent to workers'''
+    cols = set(GRP_KEY_COLS.get(col, col) for col in _aggregated_cols(plan))
+    cols.update(plan.base_cols)
+    cols.update(source for dummy, source, category in plan.dummy_cols)
+    return cols
+
+def merge_partials(partials):
+    '''merges shared states of all partitions'''
+    return reduce(lambda merged, partial: merged.merge(partial), partials, AggregateState())
+
+def partition_state(reference_stats, local, shared, claims):
+    '''reference stats with shared state of all partitions and local state of the partition added (reference tables
+    are copied once), all claims of the partition are marked as aggregated (claims not counted in the partition are
+    in reference stats or counted in another partition under the same ClaimID)'''
+    if not shared.tables and not local.tables:
+        #no claim of the batch is counted, so all of them are in reference stats
+        return reference_stats
+    state = reference_stats.merge(shared.merge(local))
+    state.vocab.encode(claims['ClaimID'], 'ClaimID', grow=True)
+    return state
+
+
+def run_worker(conn, reference_stats):
+    '''serves batches sent by coordinator on connection conn until it sends None'''
+    conn.send(('ready', reference_stats.fingerprint()))
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        action, claims, counted = message
+        try:
+            with profile(Profiler()) as profiler:
+                #features are computed as predict_fraud does, so only the key sets they read are aggregated
+                plan = FULL_PLAN if action == 'features' else scoring_plan()
+                with stage('partial_stats', int(counted.sum())):
+                    local, shared = partial_stats(claims, counted, plan)
+                conn.send(('shared', shared))
+                merged = conn.recv()
+                if merged is None:
+                    break
+                with stage('partition_state', len(claims)):
+                    state = partition_state(reference_stats, local, merged, claims)
+                if not len(claims):
+                    result = None
+                elif action == 'features':
+                    result = featurize(claims, state, workers=1, scale=False)
+                else:
+                    y_pred, fraud_proba, timings = predict_fraud(claims, state, workers=1)
+                    result = (y_pred, fraud_proba)
+            conn.send(('result', result, profiler.report()))
+        except Exception:
+            conn.send(('error', traceback.format_exc()))
+
+def _local_worker(conn, reference_stats):
+    try:
+        run_worker(conn, reference_stats)
+    finally:
+        conn.close()
+
+
+class PartitionedScorer:
+    '''coordinator of workers scoring provider partitions of batches, workers are local processes (partitions of
+    them) or, with listen address (host, port), remote workers connecting to it'''
+
+    def __init__(self, reference_stats=None, partitions=None, listen=None, authkey=AUTHKEY):
+        if reference_stats is None:
+            reference_stats = load_reference_stats_if_fitted()
+        if reference_stats is None:
+            reference_stats = AggregateState.from_claims(get_train_data())
+        self.reference_stats = reference_stats
+        self.partitions = partitions or os.cpu_count()
+        self._processes = []
+        self._conns = []
+        if listen is None:
+            for _ in range(self.partitions):
+                conn, worker_conn = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_local_worker, args=(worker_conn, reference_stats), daemon=True)
+                process.start()
+                worker_conn.close()
+                self._processes.append(process)
+                self._conns.append(conn)
+        else:
+            if not authkey:
+                raise ValueError('remote workers need a secret authkey, set PARTITION_AUTHKEY env variable')
+            with Listener(listen, authkey=authkey) as listener:
+                for _ in range(self.partitions):
+                    self._conns.append(listener.accept())
+        fingerprint = reference_stats.fingerprint()
+        for conn in self._conns:
+            if conn.recv() != ('ready', fingerprint):
+                self.close()
+                raise ValueError('reference stats of a worker are different from reference stats of coordinator')
+
+    def _receive(self, conn):
+        message = conn.recv()
+        if message[0] == 'error':
+            raise RuntimeError('partition worker failed:\n'+message[1])
+        return message[1:]
+
+    def _run(self, action, claims):
+        try:
+            return self._rounds(action, claims)
+        except Exception:
+            #workers may be waiting for a round which does not come
+            self.close()
+            raise
+
+    def _rounds(self, action, claims):
+        plan = FULL_PLAN if action == 'features' else scoring_plan()
+        with stage('partition_claims', len(claims)):
+            #claims counted in aggregates of the batch, as new_claim_mask of the whole batch
+            counted = self.reference_stats.new_claim_mask(self.reference_stats.vocab.encode(claims['ClaimID'], 'ClaimID'))
+            partition = partition_of(claims['Provider'].values, self.partitions)
+            positions = [np.flatnonzero(partition == i) for i in range(self.partitions)]
+            cols = [col for col in claims.columns if col in plan_cols(plan)]
+            for conn, rows in zip(self._conns, positions):
+                conn.send((action, claims[cols].iloc[rows], counted[rows]))
+        with stage('merge_partials'):
+            merged = merge_partials([self._receive(conn)[0] for conn in self._conns])
+            for conn in self._conns:
+                conn.send(merged)
+        with stage('partition_scoring', len(claims)):
+            results = [self._receive(conn) for conn in self._conns]
+        #stages of workers are added up, so their seconds are cpu time of all workers
+        for result, stages in results:
+            for entry in stages:
+                record('worker:'+entry['stage'], entry['seconds'], entry['rows'], calls=entry['calls'])
+        scored = [i for i, (result, stages) in enumerate(results) if result is not None]
+        return np.concatenate([positions[i] for i in scored]), [results[i][0] for i in scored]
+
+    def predict(self, claims):
+        '''same as predict_fraud of claims as one batch, returns predicted labels, fraud probabilities and
+        dict of time taken (in sec) by each round'''
+        start = time.perf_counter()
+        positions, results = self._run('predict', claims)
+        #results of partitions are put back in the sequence of claims
+        order = np.argsort(positions, kind='stable')
+        y_pred = np.concatenate([labels for labels, proba in results])[order]
+        fraud_proba = np.concatenate([proba for labels, proba in results])[order]
+        return y_pred, fraud_proba, {'partitioned_scoring': time.perf_counter()-start}
+
+    def featurize(self, claims):
+        '''unscaled features dataframe of claims as one batch, same as featurize(claims, scale=False)'''
+        positions, results = self._run('features', claims)
+        return pd.concat(results).iloc[np.argsort(positions, kind='stable')]
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(None)
+                conn.close()
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join()
+        self._conns, self._processes = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def feature_engg_partitioned(test_data, train_data, partitions=2):
+    '''same as feature_engg_from_stats on stats of train_data but computed by partitions worker processes,
+    returns unscaled features dataframe in the sequence of FEATURE_COLUMNS'''
+    with PartitionedScorer(AggregateState.from_claims(train_data), partitions) as scorer:
+        return scorer.featurize(test_data)
+
+
+def _address(text):
+    host, port = text.rsplit(':', 1)
+    return host, int(port)
+
+def main():
+    parser = argparse.ArgumentParser(description='score claims partitioned on provider by worker processes')
+    parser.add_argument('action', choices=['score', 'worker'])
+    parser.add_argument('args', nargs='+', help='beneficiary, inpatient and outpatient csv files to score, or '
+                                                'HOST:PORT of coordinator for worker')
+    parser.add_argument('-o', '--output', default='predictions.csv')
+    parser.add_argument('--partitions', type=int, help='no of partitions (workers), default is no of cpus')
+    parser.add_argument('--listen', help='HOST:PORT remote workers connect to, local worker processes are started if not given')
+    parser.add_argument('--stats', default=REFERENCE_STATS_PATH, help='precomputed reference stats file')
+    args = parser.parse_args()
+    if (args.action == 'worker' or args.listen) and not AUTHKEY:
+        parser.error('connections with remote workers need a secret, set PARTITION_AUTHKEY env variable')
+
+    reference_stats = load_reference_stats_if_fitted(args.stats)
+    if reference_stats is None:
+        reference_stats = AggregateState.from_claims(get_train_data())
+    if args.action == 'worker':
+        with Client(_address(args.args[0]), authkey=AUTHKEY) as conn:
+            run_worker(conn, reference_stats)
+        return
+    if len(args.args) != 3:
+        parser.error('score needs beneficiary, inpatient and outpatient csv files')
+
+    start = time.perf_counter()
+    claims = preparing_data(*read_raw_data(args.args))
+    with PartitionedScorer(reference_stats, args.partitions, args.listen and _address(args.listen)) as scorer:
+        scoring_start = time.perf_counter()
+        y_pred, fraud_proba, timings = scorer.predict(claims)
+    claims[OUTPUT_COLS].assign(FraudProbability=fraud_proba, PredictedFraud=y_pred).to_csv(args.output, index=False)
+    print('scored', len(claims), 'claims by', scorer.partitions, 'partitions in', round(time.perf_counter()-scoring_start, 2),
+          'sec (', round(time.perf_counter()-start, 2), 'sec with reading), predictions written to', args.output)
+
+
+if __name__ == '__main__':
+    main()
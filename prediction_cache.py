@@ -0,0 +1,129 @@
+'''cache of fraud predictions of claims, so re-running the same selection does not featurize and predict it again
+
+Prediction of a claim depends on the claim row, model/scaler (model_registry.model_version), reference stats
+(AggregateState.fingerprint) and, as in feature_engg, on claims of the batch which are not in reference stats (their
+sums and counts are added to the reference ones). So every claim is cached on its row hash and a context: hash of
+model version, reference stats and the batch's new claims (order of claims does not matter).
+ - batch having no new claims (all claims folded into reference stats, as in batch scoring): every claim is
+   independent of others, only claims not in cache are featurized and predicted and merged with cached ones
+ - batch having new claims: same batch again (e.g. same Top N selection) is served from cache, if any claim is
+   missing the whole batch is scored again, as predictions of its claims depend on the whole batch
+Results are kept in an lru dict of up to max_entries claims and optionally in a sqlite file (disk_path) shared by
+processes and kept across restarts.'''
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from model_registry import model_version
+from profiling import stage
+from scoring import get_train_stats, predict_fraud
+
+
+class PredictionCache:
+    '''lru cache (with optional sqlite tier) of predicted probability and label of claims'''
+
+    def __init__(self, max_entries=1000000, disk_path=None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path is not None:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute('create table if not exists predictions (context text, row_hash integer, proba real, '
+                             'label integer, primary key (context, row_hash))')
+            self._db.commit()
+
+    def context(self, raw_data, row_hashes, reference_stats):
+        '''hash of what predictions of the batch depend on besides claim rows, and whether batch has new claims'''
+        new = reference_stats.new_claim_mask(reference_stats.vocab.encode(raw_data['ClaimID'], 'ClaimID'))
+        digest = hashlib.blake2b(repr(model_version()).encode(), digest_size=16)
+        digest.update(reference_stats.fingerprint().encode())
+        if new.any():
+            #uint64 sum wraps around, it does not depend on order of claims
+            digest.update(np.array([row_hashes[new].sum(), new.sum()], dtype=np.uint64).tobytes())
+        return digest.hexdigest(), bool(new.any())
+
+    def _get(self, context, row_hashes):
+        #returns probabilities and labels of rows, nan/-1 for rows not in cache
+        proba = np.full(len(row_hashes), np.nan)
+        labels = np.full(len(row_hashes), -1)
+        with self._lock:
+            for i, row_hash in enumerate(row_hashes.tolist()):
+                entry = self._entries.get((context, row_hash))
+                if entry is not None:
+                    self._entries.move_to_end((context, row_hash))
+                    proba[i], labels[i] = entry
+        missing = np.flatnonzero(labels < 0)
+        if self._db is not None and len(missing):
+            found = self._disk_get(context, row_hashes[missing])
+            for i in missing:
+                entry = found.get(int(row_hashes[i]))
+                if entry is not None:
+                    proba[i], labels[i] = entry
+            self._put(context, row_hashes[missing][labels[missing] >= 0], proba[missing][labels[missing] >= 0],
+                      labels[missing][labels[missing] >= 0], disk=False)
+            self.disk_hits += int((labels[missing] >= 0).sum())
+        return proba, labels
+
+    def _disk_get(self, context, row_hashes):
+        #sqlite integers are signed, uint64 hashes are stored as int64 of same bits
+        signed = row_hashes.astype(np.uint64).view(np.int64).tolist()
+        found = {}
+        with self._lock:
+            for start in range(0, len(signed), 500):
+                part = signed[start:start+500]
+                rows = self._db.execute('select row_hash, proba, label from predictions where context = ? and row_hash in (%s)'
+                                        % ','.join('?'*len(part)), [context]+part).fetchall()
+                for row_hash, proba, label in rows:
+                    found[int(np.int64(row_hash).view(np.uint64))] = (proba, label)
+        return found
+
+    def _put(self, context, row_hashes, proba, labels, disk=True):
+        with self._lock:
+            for row_hash, value, label in zip(row_hashes.tolist(), proba.tolist(), labels.tolist()):
+                self._entries[(context, row_hash)] = (value, label)
+                self._entries.move_to_end((context, row_hash))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if disk and self._db is not None:
+                signed = row_hashes.astype(np.uint64).view(np.int64).tolist()
+                self._db.executemany('insert or replace into predictions values (?, ?, ?, ?)',
+                                     [(context, row_hash, value, label) for row_hash, value, label
+                                      in zip(signed, proba.tolist(), labels.tolist())])
+                self._db.commit()
+
+    def predict(self, raw_data, reference_stats=None, workers=None):
+        '''same as predict_fraud (without groups) but claims in cache are not featurized and predicted again
+        returns predicted labels, fraud probabilities and dict of time taken (in sec) by each stage'''
+        if reference_stats is None:
+            reference_stats = get_train_stats()
+        start = time.perf_counter()
+        with stage('prediction_cache', len(raw_data)):
+            row_hashes = pd.util.hash_pandas_object(raw_data, index=False).values
+            context, has_new = self.context(raw_data, row_hashes, reference_stats)
+            proba, labels = self._get(context, row_hashes)
+        missing = np.flatnonzero(labels < 0)
+        timings = {'cache_lookup': time.perf_counter()-start}
+        self.hits += len(labels)-len(missing)
+        self.misses += len(missing)
+        if len(missing):
+            #claims of a batch having new claims depend on each other, so whole batch is scored again
+            rows = np.arange(len(raw_data)) if has_new else missing
+            y_pred, fraud_proba, predict_timings = predict_fraud(raw_data.iloc[rows], reference_stats, workers=workers)
+            timings.update(predict_timings)
+            proba[rows], labels[rows] = fraud_proba, y_pred
+            self._put(context, row_hashes[rows], proba[rows], labels[rows])
+        return labels.astype(int), proba, timings
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                    'disk_hits': self.disk_hits, 'misses': self.misses, 'disk_path': self.disk_path}
@@ -0,0 +1,148 @@
+'''columnar on disk cache of prepared data (output of preparing_data)
+
+Cache is a directory per set of source csv files, named by hash of their content, having one .npy file per column
+ - id and code columns (strings) are dictionary encoded as int32 codes with their vocabulary and loaded as Categorical
+ - float columns are stored as float32 when it is lossless (amounts are whole numbers), ints in smallest int type
+ - dates are stored as int64 nanoseconds
+Columns are memory mapped (copy on write) on load, so loading is nearly instant and pages are read only when used.
+Code which aggregates this data (or output of preparing_data, which has float32 amounts) should use to_plain_dtypes,
+as pandas averages float32 in float32 and groups categoricals on all combinations of categories.'''
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+from data_prep import preparing_data, read_raw_data
+from profiling import stage
+
+
+CACHE_DIR = 'cache'
+CACHE_VERSION = 1
+
+
+def _file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def files_fingerprint(files, cache_dir=CACHE_DIR):
+    '''hash of content of all files, hash of each file is remembered against its size and modification time
+    in cache_dir/file_hashes.json so that unchanged files are not read again (unreadable file is rebuilt)'''
+    known_path = os.path.join(cache_dir, 'file_hashes.json')
+    known = {}
+    if os.path.exists(known_path):
+        try:
+            with open(known_path) as f:
+                known = json.load(f)
+        except (OSError, ValueError):
+            known = {}
+        if not isinstance(known, dict):
+            known = {}
+    sha = hashlib.sha256(str(CACHE_VERSION).encode())
+    changed = False
+    for path in files:
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = known.get(key)
+        if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': _file_sha256(path)}
+            known[key] = entry
+            changed = True
+        sha.update(entry['sha256'].encode())
+    if changed:
+        os.makedirs(cache_dir, exist_ok=True)
+        #written to a temp file and renamed, so other processes never read a partly written file
+        fd, temp_path = tempfile.mkstemp(prefix='file_hashes.', suffix='.tmp', dir=cache_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(known, f, indent=1)
+            os.replace(temp_path, known_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    return sha.hexdigest()
+
+def _narrow(values):
+    '''smallest dtype which holds values without any loss'''
+    if values.dtype.kind == 'f':
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(values.dtype), values, equal_nan=True):
+            return narrow
+        return values
+    if values.dtype.kind in 'iu' and len(values):
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if values.min() >= info.min and values.max() <= info.max:
+                return values.astype(dtype)
+    return values
+
+def save_prepared(data, directory):
+    '''saves prepared dataframe as one .npy file per column in directory'''
+    os.makedirs(directory, exist_ok=True)
+    meta = {'columns': [], 'rows': len(data)}
+    for i, col in enumerate(data.columns):
+        series = data[col]
+        name = 'col'+str(i)
+        if pd.api.types.is_datetime64_any_dtype(series):
+            kind = 'datetime'
+            np.save(os.path.join(directory, name+'.npy'), series.values.astype('datetime64[ns]').view(np.int64))
+        elif series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype):
+            kind = 'category'
+            codes, categories = pd.factorize(series.astype(object))
+            np.save(os.path.join(directory, name+'.npy'), codes.astype(np.int32))
+            np.save(os.path.join(directory, name+'.categories.npy'), np.asarray(categories, dtype=str))
+        else:
+            kind = 'numeric'
+            np.save(os.path.join(directory, name+'.npy'), _narrow(series.values))
+        meta['columns'].append({'name': col, 'file': name, 'kind': kind})
+    #meta is written at last, a directory without meta is an incomplete cache
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+def load_prepared(directory):
+    '''loads prepared dataframe saved by save_prepared, columns are memory mapped'''
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    columns = []
+    for col in meta['columns']:
+        values = np.load(os.path.join(directory, col['file']+'.npy'), mmap_mode='c')
+        if col['kind'] == 'datetime':
+            values = pd.Series(values.view('datetime64[ns]'), name=col['name'], copy=False)
+        elif col['kind'] == 'category':
+            categories = np.load(os.path.join(directory, col['file']+'.categories.npy'))
+            values = pd.Series(pd.Categorical.from_codes(values, categories.astype(object)), name=col['name'])
+        else:
+            values = pd.Series(values, name=col['name'], copy=False)
+        columns.append(values)
+    if not columns:
+        return pd.DataFrame(index=pd.RangeIndex(meta['rows']))
+    #concat without copy keeps the memory mapped columns as they are
+    return pd.concat(columns, axis=1, copy=False)
+
+def load_or_prepare(files, cache_dir=CACHE_DIR):
+    '''returns prepared data of beneficiary, inpatient and outpatient csv files from cache,
+    csv files are read and prepared (and cached) only if these files are not cached yet'''
+    directory = os.path.join(cache_dir, files_fingerprint(files, cache_dir)[:20])
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        save_prepared(preparing_data(*read_raw_data(files)), directory)
+    with stage('load_prepared_cache') as call:
+        data = load_prepared(directory)
+        call.rows = len(data)
+    return data
+
+def to_plain_dtypes(data):
+    '''returns data with categorical columns as object and float32 columns as float64, for grouping and averaging'''
+    converted = {}
+    for col in data.columns:
+        dtype = data[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            converted[col] = data[col].astype(object)
+        elif dtype == np.float32:
+            converted[col] = data[col].astype(np.float64)
+    if not converted:
+        return data
+    return data.assign(**converted)
@@ -0,0 +1,147 @@
+'''per stage profiling of the scoring pipeline
+
+Pipeline code marks its stages with `with stage('name', rows) as call:` (call.rows can be set inside the block when
+no of rows is known only after the stage), it costs nothing when no profiler is active.
+A profiler is activated for a block of code with `with profile() as profiler:` and records for every stage
+no of calls, total time, no of rows and peak memory, it can be exported as json (report) or prometheus text format.
+Peak memory is the highest memory allocated (traced by tracemalloc, numpy arrays included) during the stage over memory
+allocated at its start, it is traced only if the profiler is created with trace_memory=True as tracing slows down
+allocations. When feature blocks run in parallel threads their peaks overlap, so peaks are approximate in that case.
+
+    with profile(Profiler(trace_memory=True)) as profiler:
+        predict_fraud(claims, reference_stats)
+    print(profiler.to_prometheus())'''
+import contextvars
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+_active = contextvars.ContextVar('active_profiler', default=None)
+
+
+class _Call:
+    def __init__(self, rows=None):
+        self.rows = rows
+
+
+class _Stage:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.peak_memory_bytes = None
+
+
+class Profiler:
+    '''collects calls, time, rows and peak memory of stages, a profiler can be activated many times to accumulate'''
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        frame = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            #peak so far belongs to the enclosing stages, it is noted before the peak is reset for this stage
+            for outer in self._stack():
+                outer['peak'] = max(outer['peak'], peak)
+            tracemalloc.reset_peak()
+            frame = {'start': current, 'peak': current}
+            self._stack().append(frame)
+        call = _Call(rows)
+        start = time.perf_counter()
+        try:
+            yield call
+        finally:
+            seconds = time.perf_counter()-start
+            memory = None
+            if frame is not None:
+                frame['peak'] = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                self._stack().pop()
+                for outer in self._stack():
+                    outer['peak'] = max(outer['peak'], frame['peak'])
+                memory = frame['peak']-frame['start']
+            self.record(name, seconds, call.rows, memory)
+
+    def record(self, name, seconds, rows=None, peak_memory_bytes=None, calls=1):
+        '''adds calls of stage, for stages timed by the caller or taken from report of another profiler'''
+        with self._lock:
+            entry = self.stages.setdefault(name, _Stage())
+            entry.calls += calls
+            entry.seconds += seconds
+            entry.rows += rows or 0
+            if peak_memory_bytes is not None:
+                entry.peak_memory_bytes = max(entry.peak_memory_bytes or 0, peak_memory_bytes)
+
+    def report(self):
+        '''list of stages (in sequence of first call) with calls, seconds, rows and peak_memory_bytes'''
+        with self._lock:
+            return [{'stage': name, 'calls': entry.calls, 'seconds': entry.seconds, 'rows': entry.rows,
+                     'peak_memory_bytes': entry.peak_memory_bytes} for name, entry in self.stages.items()]
+
+    def to_json(self):
+        return json.dumps(self.report(), indent=2)
+
+    def to_prometheus(self, prefix='fraud_scoring'):
+        '''stages in prometheus text exposition format'''
+        metrics = [('stage_calls_total', 'counter', 'calls', 'no of calls of the stage'),
+                   ('stage_seconds_total', 'counter', 'seconds', 'total time taken by the stage'),
+                   ('stage_rows_total', 'counter', 'rows', 'total rows processed by the stage'),
+                   ('stage_peak_memory_bytes', 'gauge', 'peak_memory_bytes', 'highest memory allocated during the stage')]
+        report = self.report()
+        lines = []
+        for name, kind, key, description in metrics:
+            lines.append('# HELP %s_%s %s' % (prefix, name, description))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+            for entry in report:
+                if entry[key] is not None:
+                    stage_label = entry['stage'].replace('\\', '\\\\').replace('"', '\\"')
+                    lines.append('%s_%s{stage="%s"} %s' % (prefix, name, stage_label, repr(float(entry[key]))))
+        return '\n'.join(lines)+'\n'
+
+
+@contextmanager
+def profile(profiler=None):
+    '''activates profiler (a new one if not passed) for the block, memory tracing is started if profiler traces memory'''
+    profiler = profiler if profiler is not None else Profiler()
+    started = profiler.trace_memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    token = _active.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active.reset(token)
+        if started:
+            tracemalloc.stop()
+
+def active_profiler():
+    return _active.get()
+
+@contextmanager
+def stage(name, rows=None):
+    '''times the block as a stage of active profiler, does nothing if no profiler is active'''
+    profiler = _active.get()
+    if profiler is None:
+        yield _Call(rows)
+    else:
+        with profiler.stage(name, rows) as call:
+            yield call
+
+def record(name, seconds, rows=None, calls=1):
+    '''records time measured by the caller as a stage of active profiler, if any'''
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.record(name, seconds, rows, calls=calls)
@@ -0,0 +1,130 @@
+'''provider level scoring: aggregates of fraud predictions of all claims of providers
+
+ProviderIndex keeps row positions of claims of every provider (claim_index.KeyIndex), so claims of a provider are
+taken without scanning the data. ProviderScorer scores claims of all requested providers in one
+predict_fraud call, claims of every provider being a separate group (see feature_engg_from_stats), so results of a
+provider are same whichever providers are scored along with it, and returns per provider
+  claims, fraud_claims, fraud_claim_rate, max_probability, mean_probability and top_claims (ClaimID, probability
+  of claims with highest fraud probability)
+Results are cached per provider along with fingerprint of its claims (sum of hashes of its rows), reference stats
+and model version, so a provider is scored again only when its claims (set_claims), reference stats or model change.'''
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from claim_index import KeyIndex
+from model_registry import model_version
+from profiling import stage
+from scoring import get_train_stats, predict_fraud
+
+
+RESULT_COLS = ['claims', 'fraud_claims', 'fraud_claim_rate', 'max_probability', 'mean_probability', 'top_claims']
+
+
+class ProviderIndex:
+    '''row positions (see claim_index.KeyIndex) and content fingerprint of claims of every provider'''
+
+    def __init__(self, claims):
+        with stage('provider_index', len(claims)):
+            self.key_index = KeyIndex(claims['Provider'])
+            self.providers = self.key_index.keys
+            #uint64 sums wrap around, sum of row hashes changes if any claim of the provider is added, removed or changed
+            row_hashes = pd.util.hash_pandas_object(claims, index=False).values
+            self.fingerprints = (np.add.reduceat(row_hashes[self.key_index.order], self.key_index.offsets[:-1])
+                                 if len(self.providers) else np.array([], dtype=np.uint64))
+
+    def positions(self, provider):
+        '''row positions of claims of provider, empty if provider has no claims'''
+        return self.key_index.positions(provider)
+
+    def fingerprint(self, provider):
+        i = self.key_index.key_positions([provider])[0]
+        return None if i < 0 else int(self.fingerprints[i])
+
+
+class ProviderScorer:
+    '''scores providers on their claims with per provider cache of results (up to max_cached providers)'''
+
+    def __init__(self, claims, reference_stats=None, top_n=5, max_cached=10000):
+        #stats of train data (aggregated once per process) are used if reference stats are not precomputed
+        self.reference_stats = reference_stats if reference_stats is not None else get_train_stats()
+        self.top_n = top_n
+        self.max_cached = max_cached
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.set_claims(claims)
+
+    def set_claims(self, claims):
+        '''replaces claims of providers, cached results of providers whose claims have not changed remain valid'''
+        index = ProviderIndex(claims)
+        with self._lock:
+            self.claims, self.index = claims, index
+
+    def _version(self):
+        #stats only grow, so no of aggregated claims changes whenever stats are updated
+        return model_version(), id(self.reference_stats), len(self.reference_stats.claim_ids)
+
+    def score(self, providers):
+        '''returns dataframe of results (RESULT_COLS) indexed on given providers, providers without claims have 0 claims'''
+        providers = list(dict.fromkeys(providers))
+        version = self._version()
+        with self._lock:
+            claims, index = self.claims, self.index
+            results = {}
+            missing = []
+            for provider in providers:
+                key = (index.fingerprint(provider), version)
+                cached = self._cache.get(provider)
+                if cached is not None and cached[0] == key:
+                    self._cache.move_to_end(provider)
+                    results[provider] = cached[1]
+                    self.hits += 1
+                else:
+                    missing.append((provider, key))
+            self.misses += len(missing)
+
+        if missing:
+            scored = self._score([provider for provider, key in missing], claims, index)
+            with self._lock:
+                for provider, key in missing:
+                    results[provider] = scored[provider]
+                    self._cache[provider] = (key, scored[provider])
+                    self._cache.move_to_end(provider)
+                while len(self._cache) > self.max_cached:
+                    self._cache.popitem(last=False)
+        return pd.DataFrame([results[provider] for provider in providers], index=pd.Index(providers, name='Provider'),
+                            columns=RESULT_COLS)
+
+    def _score(self, providers, claims, index):
+        positions = [index.positions(provider) for provider in providers]
+        sizes = np.array([len(rows) for rows in positions])
+        results = dict((provider, {'claims': 0, 'fraud_claims': 0, 'fraud_claim_rate': np.nan, 'max_probability': np.nan,
+                                   'mean_probability': np.nan, 'top_claims': []})
+                       for provider, size in zip(providers, sizes) if size == 0)
+        if sizes.sum() == 0:
+            return results
+        with stage('provider_scoring', int(sizes.sum())):
+            batch = claims.iloc[np.concatenate(positions)]
+            groups = np.repeat(np.arange(len(providers)), sizes)
+            y_pred, fraud_proba, timings = predict_fraud(batch, self.reference_stats, groups=groups)
+            #aggregates of all providers in one go, each provider is a contiguous slice of the batch
+            scored = sizes > 0
+            starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])[scored]
+            fraud_claims = np.add.reduceat(y_pred, starts)
+            max_proba = np.maximum.reduceat(fraud_proba, starts)
+            sum_proba = np.add.reduceat(fraud_proba.astype(np.float64), starts)
+            claim_ids = batch['ClaimID'].values
+            for i, (provider, start, size) in enumerate(zip(np.array(providers, dtype=object)[scored], starts, sizes[scored])):
+                top = start+np.argsort(-fraud_proba[start:start+size], kind='stable')[:self.top_n]
+                results[provider] = {'claims': int(size), 'fraud_claims': int(fraud_claims[i]),
+                                     'fraud_claim_rate': fraud_claims[i]/size, 'max_probability': float(max_proba[i]),
+                                     'mean_probability': sum_proba[i]/size,
+                                     'top_claims': [(str(claim_ids[j]), float(fraud_proba[j])) for j in top]}
+        return results
+
+    def cache_info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'cached_providers': len(self._cache)}
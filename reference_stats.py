@@ -0,0 +1,263 @@
+'''precomputed reference statistics of train data for feature engineering
+
+feature_engg re-aggregates the whole train data together with every batch passed for prediction.
+All of its features are means and counts per key, so here we compute per key sum and count of every required
+column once (fit step) and persist them as keyed tables. While predicting, the batch's own claims are folded
+into these tables and features are looked up (see feature_engine.py), this gives the same features as feature_engg
+for the cost of the batch only.
+
+The stats are kept as AggregateState, so nightly refresh only folds new claim files into the saved stats.
+Keys not yet in a table are appended as levels of the table (id_encoding.push_level), so folding a batch costs
+the batch and not the size of the stats, levels are merged into one table when tables are read.
+Id and code columns are aggregated as int codes of the vocabulary saved with the stats (see id_encoding.py).
+
+usage for fit step:      python reference_stats.py fit [--output reference_stats.bin]
+usage for update step:   python reference_stats.py update beneficiary.csv inpatient.csv outpatient.csv'''
+import argparse
+import hashlib
+import os
+import time
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+
+from feature_spec import AGG_SPEC, GRP_KEY_COLS, TF_IDF_COLS
+from id_encoding import ID_COLS, IdVocabulary, push_level
+from tf_idf import TfIdfIndex
+
+
+REFERENCE_STATS_PATH = 'reference_stats.bin'
+#version of saved stats, stats saved by older version have to be fitted again
+STATS_VERSION = 2
+
+
+def stat_plan():
+    '''returns dict of grouping keys -> (columns whose sum is required, columns whose non null count is required)
+    row count of each group is always computed and stored as '_rows' column'''
+    plan = {}
+    def add(keys, sum_cols=(), count_cols=()):
+        sums, counts = plan.setdefault(keys, ([], []))
+        sums.extend(col for col in sum_cols if col not in sums)
+        counts.extend(col for col in count_cols if col not in counts)
+
+    for keys, features in AGG_SPEC.items():
+        mean_cols = [value for name, op, value in features if op == 'mean']
+        add(keys, mean_cols, mean_cols)
+    #tf-idf needs term count per provider and code, no of codes per provider and no of claims per code
+    for col in TF_IDF_COLS:
+        add(('Provider', col))
+        add(('Provider',), count_cols=[col])
+        add((col,))
+    return plan
+
+def aggregate(encoded, keys, sum_cols, count_cols):
+    '''computes row count, sums and non null counts of given columns per key on encoded claims (see encode_claims),
+    rows having nan (code -1) in any key are skipped'''
+    key_codes = [encoded[key].values for key in keys]
+    valid = np.logical_and.reduce([codes >= 0 for codes in key_codes])
+    columns = {'_rows': np.ones(valid.sum())}
+    for col in sum_cols:
+        values = encoded[col].values[valid]
+        columns[col+'_sum'] = np.where(np.isnan(values), 0.0, values)
+    for col in count_cols:
+        values = encoded[col].values[valid]
+        columns[col+'_count'] = (values >= 0 if values.dtype.kind == 'i' else ~np.isnan(values)).astype(np.float64)
+    by = key_codes[0][valid] if len(keys) == 1 else [codes[valid] for codes in key_codes]
+    table = pd.DataFrame(columns).groupby(by, sort=False).sum()
+    table.index.names = list(keys)
+    return table
+
+def needed_cols():
+    '''set of columns of claims used for aggregation'''
+    cols = {'ClaimID'}
+    for keys, (sum_cols, count_cols) in stat_plan().items():
+        cols.update(keys)
+        cols.update(sum_cols)
+        cols.update(count_cols)
+    return cols
+
+def encode_claims(data, vocab, grow=False, cols=None):
+    '''returns dataframe of columns required for aggregation (or of given cols of them), id and code columns as
+    int32 codes of vocab and value columns as float64'''
+    encoded = {}
+    for col in sorted(needed_cols() if cols is None else cols, key=lambda col: (col not in ID_COLS, col)):
+        if col in GRP_KEY_COLS:
+            encoded[col] = vocab.encode_grp(data[GRP_KEY_COLS[col]], col, grow)
+        elif col in ID_COLS:
+            encoded[col] = vocab.encode(data[col], col, grow)
+        else:
+            encoded[col] = data[col].values.astype(np.float64)
+    return pd.DataFrame(encoded, index=data.index)
+
+class AggregateState:
+    '''mergeable per key aggregate state (row count, sums and non null counts) of claims
+    new claims are folded into it without recomputing over already aggregated claims,
+    and states built on different shards of claims can be merged.
+    Tables are keyed on int codes of id columns, vocab (IdVocabulary) has the values of these codes
+    and its ClaimID vocabulary is the set of claims aggregated in the state'''
+
+    def __init__(self, tables=None, vocab=None):
+        self._levels = dict((keys, [table]) for keys, table in (tables or {}).items())
+        self.vocab = vocab if vocab is not None else IdVocabulary()
+        self.version = STATS_VERSION
+
+    @classmethod
+    def from_claims(cls, claims):
+        '''builds state from prepared claims (output of preparing_data)'''
+        return cls().update(claims)
+
+    @property
+    def tables(self):
+        '''dict of key set -> table of its row count, sums and non null counts indexed on codes of the keys'''
+        for keys, levels in self._levels.items():
+            if len(levels) > 1:
+                self._levels[keys] = [pd.concat(levels)]
+        return dict((keys, levels[0]) for keys, levels in self._levels.items())
+
+    @property
+    def n_providers(self):
+        return len(self.tables[('Provider',)])
+
+    @property
+    def claim_ids(self):
+        return self.vocab.values.get('ClaimID', pd.Index([], dtype=object))
+
+    def tf_idf_index(self):
+        '''sparse tf-idf index (see tf_idf.py) of the state, it is built on first use after the state changes'''
+        if getattr(self, '_tf_idf_index', None) is None:
+            self._tf_idf_index = TfIdfIndex(self)
+        return self._tf_idf_index
+
+    def fingerprint(self):
+        '''hash of vocabulary and tables of the state, computed on first use after the state changes'''
+        if getattr(self, '_fingerprint', None) is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for col in sorted(self.vocab.values):
+                digest.update(col.encode())
+                digest.update(pd.util.hash_pandas_object(self.vocab.values[col], index=False).values.tobytes())
+            for keys in sorted(self.tables):
+                digest.update(repr(keys).encode())
+                digest.update(pd.util.hash_pandas_object(self.tables[keys], index=True).values.tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def __getstate__(self):
+        #tf-idf index and fingerprint are derived from tables, so they are not saved, levels are saved merged
+        state = self.__dict__.copy()
+        state.pop('_tf_idf_index', None)
+        state.pop('_fingerprint', None)
+        state['tables'] = self.tables
+        state.pop('_levels')
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        self._levels = dict((keys, [table]) for keys, table in state.pop('tables').items())
+        self.__dict__.update(state)
+
+    def new_claim_mask(self, claim_codes, groups=None):
+        '''bool array of claims (given as ClaimID codes of vocab) which are not yet aggregated in this state,
+        only first claim of duplicate ClaimIDs (of same group, if groups are given) is taken,
+        same as drop_duplicates(subset='ClaimID')'''
+        claim_codes = np.asarray(claim_codes)
+        new = (claim_codes < 0) | (claim_codes >= self.vocab.size('ClaimID'))
+        if groups is None:
+            return new & ~pd.Series(claim_codes).duplicated().values
+        return new & ~pd.DataFrame({'group': groups, 'claim': claim_codes}).duplicated().values
+
+    def new_claims(self, claims):
+        '''returns claims which are not yet aggregated in this state'''
+        return claims[self.new_claim_mask(self.vocab.encode(claims['ClaimID'], 'ClaimID'))]
+
+    def update(self, claims):
+        '''folds new batch of prepared claims into this state in place, claims already aggregated are skipped
+        claims without ClaimID are skipped too, they could not be told apart from the same claims folded again'''
+        claims = self.new_claims(claims[claims['ClaimID'].notna().values])
+        if len(claims):
+            encoded = encode_claims(claims, self.vocab, grow=True)
+            self._add({keys: aggregate(encoded, keys, sum_cols, count_cols)
+                       for keys, (sum_cols, count_cols) in stat_plan().items()})
+        return self
+
+    def merge(self, other):
+        '''returns a new state combining this state with state of another (disjoint) shard of claims'''
+        vocab, remap = self.vocab.merge(other.vocab)
+        if (remap.get('ClaimID', np.array([], dtype=int)) < self.vocab.size('ClaimID')).any():
+            raise ValueError('can not merge aggregate states having common claims, they would be counted twice')
+        merged = AggregateState({keys: table.copy() for keys, table in self.tables.items()}, vocab)
+        merged._add({keys: _remap_index(table, keys, remap) for keys, table in other.tables.items()})
+        return merged
+
+    def _add(self, tables):
+        #keys already in a level of table are added in place, only unseen keys are appended as a new level
+        self._tf_idf_index = None
+        self._fingerprint = None
+        for keys, delta in tables.items():
+            levels = self._levels.get(keys)
+            if levels is None:
+                self._levels[keys] = [delta.copy()]
+                continue
+            delta = delta[levels[0].columns]
+            unseen = np.ones(len(delta), dtype=bool)
+            for table in levels:
+                pos = table.index.get_indexer(delta.index)
+                seen = pos >= 0
+                if seen.any():
+                    table.iloc[pos[seen]] = table.iloc[pos[seen]].values + delta.values[seen]
+                    unseen &= ~seen
+            if unseen.any():
+                push_level(levels, delta[unseen], pd.concat)
+
+def _remap_index(table, keys, remap):
+    #codes of index of table are mapped to codes of merged vocabulary
+    if len(keys) == 1:
+        index = pd.Index(remap[keys[0]][table.index.values], name=keys[0])
+    else:
+        index = pd.MultiIndex.from_arrays([remap[key][table.index.get_level_values(i).values] for i, key in enumerate(keys)],
+                                          names=list(keys))
+    return table.set_axis(index, axis=0)
+
+def fit_reference_stats(train_data):
+    '''computes aggregate state of prepared train data (output of preparing_data)'''
+    return AggregateState.from_claims(train_data)
+
+def save_reference_stats(stats, path=REFERENCE_STATS_PATH):
+    dump(stats, path, compress=3)
+
+def load_reference_stats(path=REFERENCE_STATS_PATH):
+    stats = load(path)
+    if getattr(stats, 'version', 1) != STATS_VERSION:
+        raise ValueError(path+' is saved by an older version, run "python reference_stats.py fit" again')
+    return stats
+
+def load_reference_stats_if_fitted(path=REFERENCE_STATS_PATH):
+    '''loads reference stats if fit step has been run, otherwise returns None'''
+    if os.path.exists(path):
+        return load_reference_stats(path)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='fit or update precomputed reference stats for feature engineering')
+    parser.add_argument('action', choices=['fit', 'update'])
+    parser.add_argument('files', nargs='*', help='beneficiary, inpatient and outpatient csv files of new claims for update')
+    parser.add_argument('--output', default=REFERENCE_STATS_PATH)
+    args = parser.parse_args()
+
+    from data_prep import load_train_data, preparing_data, read_raw_data
+    start = time.time()
+    if args.action == 'fit':
+        stats = fit_reference_stats(load_train_data())
+    else:
+        if len(args.files) != 3:
+            parser.error('update needs beneficiary, inpatient and outpatient csv files')
+        stats = load_reference_stats(args.output)
+        stats.update(preparing_data(*read_raw_data(args.files)))
+    save_reference_stats(stats, args.output)
+    print('reference stats of', len(stats.claim_ids), 'claims saved to', args.output, 'in', round(time.time()-start, 2), 'sec')
+
+
+if __name__ == '__main__':
+    #running main of imported module, so that pickled stats refer to reference_stats.AggregateState and not __main__
+    import reference_stats
+    reference_stats.main()
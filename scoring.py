@@ -0,0 +1,95 @@
+'''featurization and prediction of prepared claims, used by streamlit app and batch scoring (does not need streamlit)'''
+import os
+import time
+
+from caching import resource
+from data_prep import get_train_data, train_files_key
+from feature_engine import FULL_PLAN, check_feature_order, feature_engg_from_stats, plan_for_model
+from model_registry import get_compiled_model, get_fused_model, get_model, get_scaler
+from profiling import stage
+from reference_stats import AggregateState
+
+
+#batches up to this many claims are predicted by compiled model (compiled_model.py), it has no per call overhead
+#of xgboost but xgboost is faster for large batches. Both give same labels, probabilities can differ in last bit of float32
+COMPILED_MAX_ROWS = 1000
+#only features read by splits of the model are computed (see FeaturePlan in feature_engine.py), PRUNE_FEATURES=0 computes all
+PRUNE_FEATURES = os.environ.get('PRUNE_FEATURES', '1') != '0'
+
+
+@resource('train_stats', key=train_files_key)
+def get_train_stats():
+    '''aggregate state of train data, reference for featurization when reference stats are not fitted'''
+    train_data = get_train_data()
+    with stage('aggregate_reference', len(train_data)):
+        return AggregateState.from_claims(train_data)
+
+def featurize(raw_data, reference_stats=None, train_data=None, workers=None, scale=True, groups=None, plan=None,
+              min_rows=None):
+    '''returns float32 matrix of prepared claims scaled by Std Scaler, or unscaled features dataframe if scale is False
+    precomputed reference stats are used if passed, otherwise stats of train_data are aggregated for this call
+    (stats of train files are aggregated once per process if train_data is not passed either)
+    workers is no of threads computing feature blocks (for batches of at least min_rows claims), groups are independent
+    batches in raw_data and plan is the subset of features computed (see feature_engg_from_stats in feature_engine.py)'''
+    if reference_stats is None and train_data is None:
+        reference_stats = get_train_stats()
+    elif reference_stats is None:
+        #same features as feature_engg (train data aggregated along with the batch) but by the single pass engine
+        with stage('aggregate_reference', len(train_data)):
+            reference_stats = AggregateState.from_claims(train_data)
+    if not scale:
+        return feature_engg_from_stats(raw_data, reference_stats, workers, groups, plan, min_rows=min_rows)
+    #features are scaled as they are written into the matrix, there is no separate scaling pass or copy
+    scaler = get_scaler()
+    check_feature_order(scaler)
+    return feature_engg_from_stats(raw_data, reference_stats, workers, groups, plan, scaler, min_rows)
+
+def scoring_plan():
+    '''plan of features computed by predict_fraud, features read by splits of the model unless PRUNE_FEATURES is off'''
+    if not PRUNE_FEATURES:
+        return FULL_PLAN
+    #compiled model has the same trees as xgb model, so it tells which features are read by them
+    return plan_for_model(get_fused_model() or get_compiled_model())
+
+def scoring_model(rows):
+    '''model predicting a batch of rows claims and its name, fused model (if any) takes unscaled features'''
+    #model fused with scaler takes unscaled features, so scaling pass (and its copy of features) is skipped
+    fused_model = get_fused_model()
+    if fused_model is not None:
+        check_feature_order(fused_model)
+        return fused_model, 'fused_model'
+    if rows <= COMPILED_MAX_ROWS:
+        return get_compiled_model(), 'compiled_model'
+    return get_model(), 'xgb_model'
+
+def predict_features(features):
+    '''predicts unscaled features dataframe (FEATURE_COLUMNS), returns predicted labels and fraud probabilities'''
+    model, name = scoring_model(len(features))
+    if name != 'fused_model':
+        scaler = get_scaler()
+        check_feature_order(scaler)
+        #float32 as the matrix featurize returns, xgboost compares features in float32
+        features = scaler.transform(features).astype('float32')
+    with stage('model:'+name, len(features)):
+        fraud_proba = model.predict_proba(features)[:, 1]
+    return (fraud_proba > 0.5).astype(int), fraud_proba
+
+def predict_fraud(raw_data, reference_stats=None, train_data=None, workers=None, groups=None):
+    '''featurizes and predicts prepared claims
+    returns predicted labels, fraud probabilities and dict of time taken (in sec) by each stage'''
+    timings = {}
+    model, name = scoring_model(len(raw_data))
+    fused_model = model if name == 'fused_model' else None
+    plan = scoring_plan()
+    start = time.perf_counter()
+    with stage('feature_engg', len(raw_data)):
+        featured_data = featurize(raw_data, reference_stats, train_data, workers, fused_model is None, groups, plan)
+    timings['feature_engg'] = time.perf_counter()-start
+
+    start = time.perf_counter()
+    with stage('model:'+name, len(featured_data)):
+        fraud_proba = model.predict_proba(featured_data)[:, 1]
+    #same as XGBClassifier.predict for binary classification
+    y_pred = (fraud_proba > 0.5).astype(int)
+    timings['prediction'] = time.perf_counter()-start
+    return y_pred, fraud_proba, timings
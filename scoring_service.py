@@ -0,0 +1,290 @@
+'''async http scoring service with micro batching, it does not need streamlit
+
+Requests arriving within --max-wait-ms of each other are coalesced into one batch (up to --max-batch claims) and the
+feature + model pipeline runs once for the batch. Claims of every request are featurized as a separate group
+(see feature_engg_from_stats), so each caller gets the same predictions as if its claims were scored alone.
+While a batch is scored, new requests wait in the queue and form the next batch.
+
+endpoints
+  POST /score    body {"claims": [claim, ...]}, claim is a prepared claim record (columns of preparing_data output,
+                 id and code columns as strings as in the csv files)
+                 returns {"predictions": [{"ClaimID": .., "FraudProbability": .., "PredictedFraud": ..}, ...]}
+  GET  /metrics  queue depth, batch sizes, p50/p99 latency, counts and per stage profile of scoring as json
+  GET  /metrics/prometheus  per stage profile (calls, time, rows of feature blocks, model ...) in prometheus text format
+  GET  /health
+
+Bodies over --max-body-bytes are refused with 413 before they are read, malformed request lines and headers get 400,
+the connection is closed after both.
+
+usage: python -m scoring_service [--host 127.0.0.1] [--port 8080] [--max-wait-ms 5] [--max-batch 5000]
+                                 [--max-body-bytes 67108864]'''
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+
+from data_prep import CLAIM_DTYPES, get_train_data
+from feature_spec import BASE_COLS, DUMMY_COLS, GRP_KEY_COLS
+from profiling import Profiler, profile
+from reference_stats import fit_reference_stats, load_reference_stats_if_fitted, needed_cols
+from scoring import predict_fraud
+
+
+#columns every claim record must have, values can be null
+DUMMY_SOURCE_COLS = sorted(set(source for dummy, source, category in DUMMY_COLS))
+REQUIRED_COLS = sorted((needed_cols()-set(GRP_KEY_COLS)) | set(BASE_COLS) | set(DUMMY_SOURCE_COLS))
+HTTP_STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+               500: 'Internal Server Error'}
+#largest request body read, a body of --max-batch claims is a few MB
+MAX_BODY_BYTES = 64*2**20
+
+
+class BadRequest(Exception):
+    pass
+
+
+def claims_frame(records):
+    '''dataframe of claim records of a request, id and code columns are converted to the types of csv reading'''
+    if not isinstance(records, list) or not records or not all(isinstance(record, dict) for record in records):
+        raise BadRequest('"claims" should be a non empty list of claim records')
+    claims = pd.DataFrame.from_records(records)
+    missing = [col for col in REQUIRED_COLS if col not in claims.columns]
+    if missing:
+        raise BadRequest('claim records do not have columns: '+', '.join(missing))
+    for col, dtype in CLAIM_DTYPES.items():
+        if col not in claims.columns:
+            continue
+        if dtype == str:
+            #keys missing in some records are nan in the frame, they stay missing ids and do not become 'nan' ids
+            claims[col] = claims[col].map(lambda value: None if pd.isna(value) else value if isinstance(value, str) else str(value))
+        else:
+            claims[col] = pd.to_numeric(claims[col], errors='coerce')
+    #dummies compare Gender and Race as strings of ints ('2'), a null in any record would make the column float
+    #('2.0') and zero the dummies of all claims of the batch, so they are kept as int strings with None for null
+    for col in DUMMY_SOURCE_COLS:
+        try:
+            values = pd.to_numeric(claims[col])
+        except (ValueError, TypeError):
+            raise BadRequest(col+' should be numeric')
+        claims[col] = [None if pd.isna(value) else str(int(value)) for value in values]
+    for col in BASE_COLS:
+        try:
+            claims[col] = pd.to_numeric(claims[col])
+        except (ValueError, TypeError):
+            raise BadRequest(col+' should be numeric')
+    return claims
+
+
+class ServiceMetrics:
+    '''counters of the service, latencies and batch sizes are kept for last `window` requests/batches'''
+
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.batch_claims = deque(maxlen=window)
+        self.batch_requests = deque(maxlen=window)
+        self.requests = 0
+        self.claims = 0
+        self.errors = 0
+        self.batches = 0
+        self.queued_requests = 0
+        self.queued_claims = 0
+
+    def snapshot(self):
+        latencies = np.array(self.latencies)
+        return {'queue_depth': {'requests': self.queued_requests, 'claims': self.queued_claims},
+                'requests': self.requests, 'claims': self.claims, 'errors': self.errors, 'batches': self.batches,
+                'batch_size': {'last_claims': self.batch_claims[-1] if self.batch_claims else 0,
+                               'mean_claims': float(np.mean(self.batch_claims)) if self.batch_claims else 0.0,
+                               'mean_requests': float(np.mean(self.batch_requests)) if self.batch_requests else 0.0},
+                'latency_ms': {'p50': float(np.percentile(latencies, 50)*1000) if len(latencies) else None,
+                               'p99': float(np.percentile(latencies, 99)*1000) if len(latencies) else None}}
+
+
+class MicroBatcher:
+    '''queues claims of requests and scores them in batches'''
+
+    def __init__(self, reference_stats, max_wait=0.005, max_batch=5000, metrics=None, profiler=None):
+        self.reference_stats = reference_stats
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.metrics = metrics or ServiceMetrics()
+        #stages of all batches are accumulated in one profiler
+        self.profiler = profiler or Profiler()
+        self.queue = asyncio.Queue()
+
+    async def submit(self, claims):
+        '''waits for the batch having claims of this request to be scored, returns its predictions'''
+        future = asyncio.get_running_loop().create_future()
+        self.metrics.queued_requests += 1
+        self.metrics.queued_claims += len(claims)
+        await self.queue.put((claims, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            n_claims = len(batch[0][0])
+            deadline = loop.time()+self.max_wait
+            while n_claims < self.max_batch:
+                timeout = deadline-loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_claims += len(item[0])
+            self.metrics.queued_requests -= len(batch)
+            self.metrics.queued_claims -= n_claims
+            self.metrics.batches += 1
+            self.metrics.batch_claims.append(n_claims)
+            self.metrics.batch_requests.append(len(batch))
+
+            frames = [claims for claims, future in batch]
+            try:
+                #pipeline runs in a thread, so requests keep coming to the queue meanwhile
+                results = await loop.run_in_executor(None, self._score, frames)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                #claims of one request may break the batch, every request is scored alone so only that request fails
+                for claims, future in batch:
+                    try:
+                        result = (await loop.run_in_executor(None, self._score, [claims]))[0]
+                    except Exception as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+                continue
+            for (claims, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _score(self, frames):
+        claims = pd.concat(frames, ignore_index=True)
+        groups = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+        with profile(self.profiler):
+            y_pred, fraud_proba, timings = predict_fraud(claims, self.reference_stats, groups=groups)
+        results = []
+        start = 0
+        for frame in frames:
+            end = start+len(frame)
+            results.append([{'ClaimID': claim_id, 'FraudProbability': float(proba), 'PredictedFraud': int(label)}
+                            for claim_id, proba, label in zip(frame['ClaimID'], fraud_proba[start:end], y_pred[start:end])])
+            start = end
+        return results
+
+
+class ScoringService:
+    '''minimal http/1.1 server (keep alive, json bodies) on asyncio streams'''
+
+    def __init__(self, batcher, max_body_bytes=MAX_BODY_BYTES):
+        self.batcher = batcher
+        self.metrics = batcher.metrics
+        self.profiler = batcher.profiler
+        self.max_body_bytes = max_body_bytes
+
+    async def respond(self, writer, status, response, keep_alive):
+        #text responses (prometheus metrics) are sent as they are, others as json
+        if isinstance(response, str):
+            payload, content_type = response.encode(), 'text/plain; version=0.0.4'
+        else:
+            payload, content_type = json.dumps(response).encode(), 'application/json'
+        writer.write(('HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n'
+                      'Connection: %s\r\n\r\n' % (status, HTTP_STATUS[status], content_type, len(payload),
+                                                  'keep-alive' if keep_alive else 'close')).encode()+payload)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = headers.get('content-length', '0')
+                #body of a malformed or too large request is not read, so the connection is closed after the error
+                if len(parts) != 3 or not length.isdigit():
+                    self.metrics.errors += 1
+                    await self.respond(writer, 400, {'error': 'malformed request line or content-length'}, False)
+                    break
+                if int(length) > self.max_body_bytes:
+                    self.metrics.errors += 1
+                    await self.respond(writer, 413, {'error': 'body is larger than %d bytes' % self.max_body_bytes}, False)
+                    break
+                method, path, version = parts
+                body = await reader.readexactly(int(length))
+                status, response = await self.route(method, path, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/metrics':
+            return 200, dict(self.metrics.snapshot(), stages=self.profiler.report())
+        if path == '/metrics/prometheus':
+            return 200, self.profiler.to_prometheus()
+        if path != '/score':
+            return 404, {'error': 'not found'}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+        start = time.perf_counter()
+        try:
+            claims = claims_frame(json.loads(body).get('claims'))
+            predictions = await self.batcher.submit(claims)
+        except (BadRequest, ValueError, AttributeError) as e:
+            self.metrics.errors += 1
+            return 400, {'error': str(e)}
+        except Exception as e:
+            self.metrics.errors += 1
+            return 500, {'error': str(e)}
+        self.metrics.requests += 1
+        self.metrics.claims += len(predictions)
+        self.metrics.latencies.append(time.perf_counter()-start)
+        return 200, {'predictions': predictions}
+
+
+async def serve(host, port, max_wait, max_batch, max_body_bytes=MAX_BODY_BYTES):
+    loop = asyncio.get_running_loop()
+    #reference stats are loaded (or aggregated from train data) once, before accepting requests
+    reference_stats = await loop.run_in_executor(
+        None, lambda: load_reference_stats_if_fitted() or fit_reference_stats(get_train_data()))
+    batcher = MicroBatcher(reference_stats, max_wait, max_batch)
+    service = ScoringService(batcher, max_body_bytes)
+    server = await asyncio.start_server(service.handle, host, port)
+    print('scoring service listening on', host+':'+str(port))
+    async with server:
+        await asyncio.gather(server.serve_forever(), batcher.run())
+
+def main():
+    parser = argparse.ArgumentParser(description='http scoring service with micro batching')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-wait-ms', type=float, default=5, help='time to wait for more requests to batch together')
+    parser.add_argument('--max-batch', type=int, default=5000, help='max no of claims in a batch')
+    parser.add_argument('--max-body-bytes', type=int, default=MAX_BODY_BYTES, help='larger request bodies get 413')
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.max_wait_ms/1000, args.max_batch, args.max_body_bytes))
+
+
+if __name__ == '__main__':
+    main()
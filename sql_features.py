@@ -0,0 +1,252 @@
+'''out of core preparing and feature engineering as SQL on an embedded analytical engine (duckdb)
+
+preparing_data and the features of feature_spec.py (same features as feature_engg_from_stats) are run as SQL over
+parquet files, so reference claims, batch and generated columns do not have to fit in memory: duckdb streams the
+columns it needs from parquet and spills joins, aggregates and sorts to temp_directory beyond memory_limit.
+ - prepare:  beneficiary, inpatient and outpatient csv files are joined and recoded as in preparing_data and
+             written as one parquet file of prepared claims
+ - features: claims of batch not in reference (first claim of a ClaimID) are added to reference claims, every key set
+             is grouped once (row count, sums and non null counts, as reference_stats.aggregate), tf-idf terms come
+             from grouped counts per provider and code, and every claim of the batch is joined with them.
+             Every key set is a separate query writing a block of features (so only one aggregate is held at a time),
+             blocks are put side by side and written in the sequence of FEATURE_COLUMNS, claims in the sequence of
+             batch files. 100k claims are featurized within memory limit of 200MB
+A FeaturePlan (feature_engine.py) prunes key sets and tf-idf columns as in feature_engg_from_stats.
+duckdb is an optional dependency (pip install duckdb), nothing else in the app needs it.
+
+usage for preparing:  python sql_features.py prepare beneficiary.csv inpatient.csv outpatient.csv --output claims.parquet
+usage for features:   python sql_features.py features --batch claims.parquet --reference train_claims.parquet
+                      [--output features.parquet] [--memory-limit 12GB] [--temp-directory spill] [--threads 4] [--prune]'''
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from data_prep import CHRONIC_COLS, CLAIM_DTYPES
+from feature_engine import FULL_PLAN
+from feature_spec import FEATURE_COLUMNS, GRP_KEY_COLS
+from prepared_cache import to_plain_dtypes
+from profiling import stage
+
+
+SQL_TYPES = {str: 'VARCHAR', 'float64': 'DOUBLE'}
+#as in preparing_data, age of beneficiaries alive is calculated for 2009-12-01, the last DOD in beneficiary data
+LAST_DAY = '2009-12-01'
+#rows per row group of features parquet file, a row group of all features takes ~1.4KB per row in memory
+FEATURE_ROW_GROUP = 16384
+
+
+def _name(col):
+    return '"'+col.replace('"', '""')+'"'
+
+def _zero(expr):
+    #nan and null features are 0, as in feature_engg (duckdb compares nan equal to nan)
+    return "coalesce(nullif(("+expr+")::DOUBLE, 'NaN'::DOUBLE), 0)"
+
+def _paths(paths):
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    return '['+', '.join("'"+path.replace("'", "''")+"'" for path in paths)+']'
+
+def _csv(path, types):
+    #types of columns present in the file (outpatient file does not have all columns of inpatient file)
+    cols = set(pd.read_csv(path, nrows=0).columns)
+    types = ', '.join("'"+col+"': '"+sql_type+"'" for col, sql_type in types.items() if col in cols)
+    return "read_csv('"+path.replace("'", "''")+"', header=true, types={"+types+"})"
+
+
+class SqlFeatureBackend:
+    '''duckdb connection running preparing_data and feature engineering as SQL, spilling to temp_directory'''
+
+    def __init__(self, memory_limit=None, temp_directory=None, threads=None, database=':memory:'):
+        if duckdb is None:
+            raise ImportError('sql backend needs duckdb, install it by "pip install duckdb"')
+        config = {}
+        if memory_limit is not None:
+            config['memory_limit'] = memory_limit
+        if temp_directory is not None:
+            config['temp_directory'] = temp_directory
+        if threads is not None:
+            config['threads'] = threads
+        self.con = duckdb.connect(database, config=config)
+        self._frames = 0
+
+    def prepare(self, files, output):
+        '''preparing_data of beneficiary, inpatient and outpatient csv files as SQL, writes prepared claims to parquet
+        file output and returns no of claims'''
+        ben_file, inp_file, out_file = files
+        claim_types = dict((col, SQL_TYPES[dtype]) for col, dtype in CLAIM_DTYPES.items())
+        chronic = ', '.join('(CASE WHEN '+_name(col)+' = 2 THEN 0 ELSE '+_name(col)+' END)::TINYINT AS '+_name(col)
+                            for col in CHRONIC_COLS)
+        query = '''
+            WITH ben AS (
+                SELECT * REPLACE ('''+chronic+''',
+                    (CASE WHEN RenalDiseaseIndicator = 'Y' THEN 1 ELSE RenalDiseaseIndicator::INTEGER END)::TINYINT
+                        AS RenalDiseaseIndicator,
+                    DOB::DATE AS DOB, DOD::DATE AS DOD),
+                    round(date_diff('day', DOB::DATE, coalesce(DOD::DATE, DATE \''''+LAST_DAY+'''\'))/365)::SMALLINT AS Age,
+                    (DOD IS NOT NULL)::TINYINT AS WhetherDead
+                FROM '''+_csv(ben_file, {'BeneID': 'VARCHAR', 'RenalDiseaseIndicator': 'VARCHAR'})+'''
+            ), claims AS (
+                SELECT *, date_diff('day', AdmissionDt::DATE, DischargeDt::DATE)+1 AS AdmitForDays
+                FROM '''+_csv(inp_file, claim_types)+'''
+                UNION ALL BY NAME
+                SELECT * FROM '''+_csv(out_file, claim_types)+'''
+            )
+            SELECT claims.*, ben.* EXCLUDE (BeneID) FROM claims JOIN ben USING (BeneID)'''
+        with stage('sql_prepare') as call:
+            self.con.execute('COPY ('+query+") TO '"+output.replace("'", "''")+"' (FORMAT PARQUET)")
+            call.rows = self.con.execute('SELECT count(*) FROM read_parquet('+_paths(output)+')').fetchone()[0]
+        return call.rows
+
+    def _source(self, data):
+        #parquet file(s) or dataframe as relation with _file and _row columns giving the sequence of claims
+        if isinstance(data, pd.DataFrame):
+            name = '_frame'+str(self._frames)
+            self._frames += 1
+            #categoricals of prepared cache would be enums, grouping and joining is done on plain values
+            frame = to_plain_dtypes(data).reset_index(drop=True)
+            self.con.register(name, frame.assign(_file='', _row=np.arange(len(frame))))
+            return name
+        return ('(SELECT * EXCLUDE (filename, file_row_number), filename AS _file, file_row_number AS _row '
+                'FROM read_parquet('+_paths(data)+', filename=true, file_row_number=true))')
+
+    def _blocks(self, plan):
+        #(stage name, SQL of block table) of every feature block, rows of every block are in sequence of _pos of batch
+        blocks = []
+        for keys, spec in plan.agg_spec.items():
+            values = list(dict.fromkeys(value for name, op, value in spec if op == 'mean'))
+            aggs = ''.join(', sum('+_name(value)+') AS '+_name(value+'_sum')+', count('+_name(value)+') AS '+_name(value+'_count')
+                           for value in values)
+            columns = []
+            for name, op, value in spec:
+                if op == 'mean':
+                    columns.append(_zero('a.'+_name(value+'_sum')+'/a.'+_name(value+'_count'))+' AS '+_name(name))
+                else:
+                    columns.append(_zero('a._rows')+' AS '+_name(name))
+            blocks.append(('sql_block:'+'+'.join(keys),
+                           'SELECT '+', '.join(columns)+' FROM batch_claims b LEFT JOIN (SELECT '+
+                           ', '.join(_name(key) for key in keys)+', count(*) AS _rows'+aggs+' FROM all_claims WHERE '+
+                           ' AND '.join(_name(key)+' IS NOT NULL' for key in keys)+' GROUP BY ALL) a ON '+
+                           ' AND '.join('b.'+_name(key)+' = a.'+_name(key) for key in keys)+' ORDER BY b._pos'))
+
+        for col in plan.tf_idf_cols:
+            code = _name(col)
+            #as tf_idf.py, tf of claims having nan provider or code and idf of claims having nan code are nan
+            tf = ('CASE WHEN b.Provider IS NOT NULL AND b.'+code+' IS NOT NULL THEN coalesce(t.n, 0)::DOUBLE/'
+                  'coalesce(d.n, 0) END')
+            idf = 'CASE WHEN b.'+code+' IS NOT NULL THEN log2(p.providers::DOUBLE/coalesce(c.n, 0)) END'
+            columns = {col+'TF': tf, col+'_IDF': idf, col+'TF-IDF': '('+tf+')*('+idf+')'}
+            blocks.append(('sql_tf_idf:'+col, 'SELECT '+', '.join(_zero(expr)+' AS '+_name(name)
+                                                                         for name, expr in columns.items() if name in plan.features)+
+                           ' FROM batch_claims b'
+                           ' LEFT JOIN (SELECT Provider, '+code+', count(*) AS n FROM all_claims'
+                           ' WHERE Provider IS NOT NULL AND '+code+' IS NOT NULL GROUP BY ALL) t'
+                           ' ON b.Provider = t.Provider AND b.'+code+' = t.'+code+
+                           ' LEFT JOIN (SELECT Provider, count('+code+') AS n FROM all_claims'
+                           ' WHERE Provider IS NOT NULL GROUP BY ALL) d ON b.Provider = d.Provider'
+                           ' LEFT JOIN (SELECT '+code+', count(*) AS n FROM all_claims WHERE '+code+' IS NOT NULL GROUP BY ALL) c'
+                           ' ON b.'+code+' = c.'+code+
+                           ' CROSS JOIN (SELECT count(DISTINCT Provider) AS providers FROM all_claims) p ORDER BY b._pos'))
+
+        columns = [_zero('b.'+_name(col))+' AS '+_name(col) for col in plan.base_cols]
+        columns += ["(b."+_name(source)+"::VARCHAR = '"+category+"')::DOUBLE AS "+_name(dummy)
+                    for dummy, source, category in plan.dummy_cols]
+        blocks.insert(0, ('sql_block:base', 'SELECT b.ClaimID, '+', '.join(columns)+' FROM batch_claims b ORDER BY b._pos'))
+        return blocks
+
+    def features(self, batch, reference, output=None, plan=None):
+        '''features of claims of batch (parquet file(s) or dataframe) with reference claims, written to parquet file
+        output (returns no of claims) or returned as dataframe of ClaimID and FEATURE_COLUMNS
+        every feature block is a separate query, so only one key set is grouped (and held in memory) at a time'''
+        plan = plan or FULL_PLAN
+        #raw columns needed, dx code groups are derived from dx codes (nan code is group 'na' as in feature_engg)
+        raw_cols = [col for col in sorted(set(GRP_KEY_COLS.get(col, col) for col in plan.encode_cols))]
+        batch_cols = list(dict.fromkeys(raw_cols+['ClaimID']+plan.base_cols+[source for dummy, source, category in plan.dummy_cols]))
+        grp_cols = ''.join(', coalesce(substr('+_name(source)+', 1, 2), \'na\') AS '+_name(grp)
+                           for grp, source in GRP_KEY_COLS.items() if grp in plan.encode_cols)
+        select_raw = ', '.join(_name(col) for col in raw_cols)
+        tables = []
+        try:
+            with stage('sql_claims'):
+                self.con.execute('CREATE OR REPLACE TEMP TABLE batch_claims AS SELECT '+
+                                 ', '.join(_name(col) for col in batch_cols)+grp_cols+
+                                 ', row_number() OVER (ORDER BY _file, _row) AS _pos FROM '+self._source(batch))
+                tables.append('batch_claims')
+                #first claim of every ClaimID, claims of reference before claims of batch
+                self.con.execute('CREATE OR REPLACE TEMP TABLE all_claims AS SELECT *'+grp_cols+' FROM ('
+                                 'SELECT '+select_raw+', 0 AS _src, _file, _row FROM '+self._source(reference)+
+                                 ' UNION ALL SELECT '+select_raw+', 1 AS _src, \'\' AS _file, _pos AS _row FROM batch_claims)'
+                                 ' QUALIFY row_number() OVER (PARTITION BY ClaimID ORDER BY _src, _file, _row) = 1')
+                tables.append('all_claims')
+            for i, (name, query) in enumerate(self._blocks(plan)):
+                with stage(name):
+                    self.con.execute('CREATE OR REPLACE TEMP TABLE block'+str(i)+' AS '+query)
+                tables.append('block'+str(i))
+
+            #every block is stored in sequence of claims of batch (insertion order is preserved), so blocks are put side
+            #by side as they are streamed, without hash join or sort of the wide result
+            columns = ', '.join((_name(name) if name in plan.features else '0.0 AS '+_name(name)) for name in FEATURE_COLUMNS)
+            query = ('SELECT ClaimID, '+columns+' FROM '+
+                     ' POSITIONAL JOIN '.join(table for table in tables if table.startswith('block')))
+            with stage('sql_features') as call:
+                if output is None:
+                    features = self.con.execute(query).df()
+                    call.rows = len(features)
+                    return features
+                #row groups of the wide feature rows are buffered before written, so they are kept small
+                self.con.execute('COPY ('+query+") TO '"+output.replace("'", "''")+"' (FORMAT PARQUET, ROW_GROUP_SIZE "+
+                                 str(FEATURE_ROW_GROUP)+')')
+                call.rows = self.con.execute('SELECT count(*) FROM read_parquet('+_paths(output)+')').fetchone()[0]
+                return call.rows
+        finally:
+            for table in tables:
+                self.con.execute('DROP TABLE IF EXISTS '+table)
+
+
+def feature_engg_sql(test_data, train_data, plan=None, **config):
+    '''same as feature_engg_from_stats on stats of train_data but computed by SQL backend, returns unscaled features
+    dataframe in the sequence of FEATURE_COLUMNS, config is passed to SqlFeatureBackend'''
+    features = SqlFeatureBackend(**config).features(test_data, train_data, plan=plan)
+    return features[FEATURE_COLUMNS].set_axis(test_data.index, axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='prepare claims or generate features out of core with duckdb')
+    parser.add_argument('action', choices=['prepare', 'features'])
+    parser.add_argument('files', nargs='*', help='beneficiary, inpatient and outpatient csv files to prepare')
+    parser.add_argument('--batch', nargs='+', help='parquet file(s) of prepared claims to featurize')
+    parser.add_argument('--reference', nargs='+', help='parquet file(s) of prepared reference (train) claims')
+    parser.add_argument('--output', help='parquet file of prepared claims or features')
+    parser.add_argument('--memory-limit', help='memory duckdb may use before spilling to disk, e.g. 12GB')
+    parser.add_argument('--temp-directory', help='directory for spilled data')
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--prune', action='store_true', help='compute only features read by splits of the model')
+    args = parser.parse_args()
+
+    backend = SqlFeatureBackend(args.memory_limit, args.temp_directory, args.threads)
+    start = time.time()
+    if args.action == 'prepare':
+        if len(args.files) != 3 or args.output is None:
+            parser.error('prepare needs beneficiary, inpatient and outpatient csv files and --output')
+        rows = backend.prepare(args.files, args.output)
+        print(rows, 'prepared claims saved to', args.output, 'in', round(time.time()-start, 2), 'sec')
+        return
+    if not args.batch or not args.reference:
+        parser.error('features needs --batch and --reference parquet files')
+    plan = None
+    if args.prune:
+        from feature_engine import plan_for_model
+        from model_registry import get_compiled_model
+        plan = plan_for_model(get_compiled_model())
+    output = args.output or 'features.parquet'
+    rows = backend.features(args.batch, args.reference, output, plan)
+    print('features of', rows, 'claims saved to', output, 'in', round(time.time()-start, 2), 'sec')
+
+
+if __name__ == '__main__':
+    main()
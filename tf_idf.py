@@ -0,0 +1,121 @@
+'''tf-idf of dx and procedure codes on sparse provider x code count matrices
+
+Every provider is a document and codes of its claims are its terms, as in tf_idf_on_dx_cpt of feature_engineering.py
+ - TF     = count of the code in claims of the provider / no of non null codes (of the column) in claims of the provider
+ - IDF    = log2(no of providers / no of claims having the code)
+ - TF-IDF = TF * IDF
+TfIdfIndex keeps term counts of every code column of an aggregate state as a sparse matrix over int codes of providers
+and codes (see id_encoding.py), with codes per provider and claims per code as vectors. It is built once per state,
+so featurizing a batch only looks up these and adds counts of claims of the batch which are not in the state.'''
+import numpy as np
+from scipy import sparse
+
+from feature_spec import TF_IDF_COLS
+
+
+def _dense(table, col, size):
+    #column of table keyed on single int code as dense vector over all codes
+    values = np.zeros(size)
+    values[table.index.values] = table[col].values
+    return values
+
+def _pick(vector, codes):
+    #values of vector at codes, 0 for codes outside it (nan or not in vocabulary)
+    valid = (codes >= 0) & (codes < len(vector))
+    values = np.zeros(len(codes))
+    values[valid] = vector[codes[valid]]
+    return values
+
+def _pick_terms(term_counts, providers, codes):
+    #term counts at (provider, code) pairs, 0 for pairs outside the matrix
+    n_providers, n_codes = term_counts.shape
+    valid = (providers >= 0) & (providers < n_providers) & (codes >= 0) & (codes < n_codes)
+    values = np.zeros(len(codes))
+    if valid.any():
+        values[valid] = np.asarray(term_counts[providers[valid], codes[valid]]).ravel()
+    return values
+
+
+class TfIdfIndex:
+    '''term counts (provider x code), codes per provider and claims per code of every tf-idf column of an aggregate state'''
+
+    def __init__(self, stats):
+        self.n_providers = stats.n_providers
+        provider_size = stats.vocab.size('Provider')
+        providers = stats.tables[('Provider',)]
+        self.term_counts, self.doc_lengths, self.code_claims = {}, {}, {}
+        for col in TF_IDF_COLS:
+            code_size = stats.vocab.size(col)
+            terms = stats.tables[('Provider', col)]
+            self.term_counts[col] = sparse.csr_matrix(
+                (terms['_rows'].values, (terms.index.get_level_values(0).values, terms.index.get_level_values(1).values)),
+                shape=(provider_size, code_size))
+            self.doc_lengths[col] = _dense(providers, col+'_count', provider_size)
+            self.code_claims[col] = _dense(stats.tables[(col,)], '_rows', code_size)
+
+    def corpus_size(self, encoded, new, groups=None):
+        '''no of providers (documents) of the state and of new claims of the batch, for every claim
+        with groups (int array, one per claim) only new claims of the claim's own group are counted'''
+        providers = encoded['Provider'].values
+        groups = _groups(groups, len(providers))
+        unseen = new & (providers >= len(self.doc_lengths[TF_IDF_COLS[0]]))
+        if not unseen.any():
+            return np.full(len(providers), self.n_providers)
+        #unique (group, provider) pairs of providers not in the state, counted per group
+        pairs = np.unique(_pair_codes(groups, providers, providers.max()+1)[unseen])
+        per_group = np.bincount(pairs//(providers.max()+1), minlength=groups.max()+1)
+        return self.n_providers+per_group[groups]
+
+    def column_features(self, col, encoded, new, n_providers, groups=None):
+        '''returns dict of feature name -> array of TF, _IDF and TF-IDF features of a code column for encoded claims
+        (see reference_stats.encode_claims), claims of new mask are counted along with the claims of the state,
+        with groups only new claims of the claim's own group are counted'''
+        providers = encoded['Provider'].values
+        codes = encoded[col].values
+        groups = _groups(groups, len(codes))
+        terms = _pick_terms(self.term_counts[col], providers, codes)
+        doc_lengths = _pick(self.doc_lengths[col], providers)
+        code_claims = _pick(self.code_claims[col], codes)
+        #counts of new claims of the batch per group, over their codes (codes not in state are after the codes of state)
+        batch_codes = codes[new]
+        batch_groups = groups[new]
+        valid = batch_codes >= 0
+        if valid.any():
+            batch_claims = sparse.csr_matrix((np.ones(valid.sum()), (batch_groups[valid], batch_codes[valid])),
+                                             shape=(groups.max()+1, batch_codes.max()+1))
+            code_claims = code_claims+_pick_terms(batch_claims, groups, codes)
+        #providers of different groups are different documents, so terms are counted per (group, provider) pair
+        pairs = _pair_codes(groups, providers, max(providers.max(), 0)+1)
+        batch_pairs = pairs[new]
+        valid = (batch_pairs >= 0) & (batch_codes >= 0)
+        if valid.any():
+            batch_terms = sparse.csr_matrix((np.ones(valid.sum()), (batch_pairs[valid], batch_codes[valid])),
+                                            shape=(batch_pairs.max()+1, batch_codes.max()+1))
+            terms = terms+_pick_terms(batch_terms, pairs, codes)
+            doc_lengths = doc_lengths+_pick(np.bincount(batch_pairs[valid]).astype(np.float64), pairs)
+
+        #tf of claims having nan provider or code and idf of claims having nan code are nan (0 in features), as in feature_engg
+        has_term = (providers >= 0) & (codes >= 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tf = np.where(has_term, terms/doc_lengths, np.nan)
+            idf = np.where(codes >= 0, np.log2(n_providers/code_claims), np.nan)
+        return {col+'TF': tf, col+'_IDF': idf, col+'TF-IDF': tf*idf}
+
+    def features(self, encoded, new, groups=None):
+        '''returns dict of feature name -> array of tf-idf features of all tf-idf columns'''
+        n_providers = self.corpus_size(encoded, new, groups)
+        features = {}
+        for col in TF_IDF_COLS:
+            features.update(self.column_features(col, encoded, new, n_providers, groups))
+        return features
+
+
+def _groups(groups, size):
+    #all claims are one group if groups are not given
+    if groups is None:
+        return np.zeros(size, dtype=np.int64)
+    return np.asarray(groups, dtype=np.int64)
+
+def _pair_codes(groups, providers, n_providers):
+    #one int code per (group, provider) pair, -1 for nan provider
+    return np.where(providers >= 0, groups*n_providers+providers, -1)